@@ -0,0 +1,130 @@
+#aho.py
+from collections import deque
+from regex import RegExpr, RSingle, RConcat, RUnion
+from fa import finditer_spans
+
+def split_literal_alternation(pattern: str):
+    # Fast path for pattern strings like foo|bar|baz: the literals without building
+    # an AST, or None if the pattern uses anything besides alphanumerics and '|'.
+    literals = pattern.split("|")
+    if all(literal.isalnum() for literal in literals):
+        return literals
+    return None
+
+def literal_alternatives(regex: RegExpr):
+    # The strings of a pattern made only of literals and alternation, e.g. foo|bar|baz,
+    # in order; None for anything else.
+    literals = []
+    pending = [regex]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, RUnion):
+            pending.append(node.right)
+            pending.append(node.left)
+            continue
+        chars = []
+        parts = [node]
+        while parts:
+            part = parts.pop()
+            match part:
+                case RConcat(left=left, right=right):
+                    parts.append(right)
+                    parts.append(left)
+                case RSingle(char=char):
+                    chars.append(char)
+                case _:
+                    return None
+        literals.append("".join(chars))
+    return literals
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton for a set of literals: a trie with failure links, built in
+    time linear in the total literal length. Offers the same accepts / search /
+    finditer interface as NFA and DFA; bytes input is read as latin-1, like the DFA.
+    """
+    def __init__(self, literals):
+        self.literals = list(literals)
+        # goto[node] maps a symbol to the child trie node; node 0 is the root
+        self.goto = [{}]
+        self.depth = [0]
+        # length of the longest literal ending at a node (own or via failure links), 0 if none
+        self.longest = [0]
+        for literal in self.literals:
+            node = 0
+            for symbol in literal:
+                child = self.goto[node].get(symbol)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto[node][symbol] = child
+                    self.goto.append({})
+                    self.depth.append(self.depth[node] + 1)
+                    self.longest.append(0)
+                node = child
+            self.longest[node] = len(literal)
+        # nodes where a literal itself ends (before failure links add shorter ones)
+        self._terminal = [node != 0 and length == depth for node, (length, depth) in enumerate(zip(self.longest, self.depth))]
+
+        # failure links in BFS order, so a node's link is final before its children's
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for symbol, child in self.goto[node].items():
+                link = self.fail[node]
+                while link and symbol not in self.goto[link]:
+                    link = self.fail[link]
+                target = self.goto[link].get(symbol, 0)
+                self.fail[child] = target if target != child else 0
+                self.longest[child] = max(self.longest[child], self.longest[self.fail[child]])
+                queue.append(child)
+
+    @classmethod
+    def from_regex(cls, regex):
+        literals = literal_alternatives(regex)
+        if literals is None:
+            raise ValueError("Pattern is not a pure literal alternation")
+        return cls(literals)
+
+    @staticmethod
+    def _text(input_string):
+        if isinstance(input_string, (bytes, bytearray, memoryview)):
+            return bytes(input_string).decode("latin-1")
+        return input_string
+
+    def accepts(self, input_string):
+        node = 0
+        for symbol in self._text(input_string):
+            node = self.goto[node].get(symbol)
+            if node is None:
+                return False
+        return self._terminal[node]
+
+    def search(self, input_string, pos=0):
+        # Leftmost-longest literal occurrence in input_string[pos:] as (start, end)
+        return self._search(self._text(input_string), pos)
+
+    def _search(self, text, pos):
+        goto = self.goto
+        fail = self.fail
+        best = None
+        node = 0
+        for position in range(pos, len(text)):
+            symbol = text[position]
+            while node and symbol not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(symbol, 0)
+            end = position + 1
+            if self.longest[node]:
+                start = end - self.longest[node]
+                if best is None or start < best[0] or start == best[0] and end > best[1]:
+                    best = (start, end)
+            # the trie node covers the longest suffix that can still grow into a match
+            if best is not None and end - self.depth[node] > best[0]:
+                return best
+        return best
+
+    def finditer(self, input_string):
+        text = self._text(input_string)
+        yield from finditer_spans(lambda pos: self._search(text, pos), len(text))
@@ -0,0 +1,109 @@
+#batch.py
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import engine
+from fa import DFA
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# set in each worker process by _init_worker
+_worker_dfa = None
+
+def _init_worker(table):
+    # Workers rebuild the DFA from its flat table once, not from a pickled DFAState graph
+    global _worker_dfa
+    _worker_dfa = DFA.from_bytes(table, copy=True)
+
+def _match_chunk(items):
+    accepts = _worker_dfa.accepts
+    return [accepts(item) for item in items]
+
+def _chunks(iterable, chunksize):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+def match_many(pattern, iterable, workers=None, chunksize=1024):
+    # Yields accepts() for every item of iterable, in order. pattern is a pattern
+    # string (compiled through engine.compile) or a DFA. The DFA goes to each of the
+    # `workers` processes once, as the bytes of DFA.to_bytes(); items then travel in
+    # chunks of `chunksize`, with at most two chunks per worker in flight, so the
+    # input is streamed rather than materialized. workers=1 matches in-process.
+    dfa = engine.compile(pattern, mode="dfa") if isinstance(pattern, str) else pattern
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for item in iterable:
+            yield dfa.accepts(item)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(dfa.to_bytes(),)) as executor:
+        pending = deque()
+        for chunk in _chunks(iterable, chunksize):
+            pending.append(executor.submit(_match_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def _code_units(strings):
+    # All-str or all-bytes inputs concatenated into one flat array: uint8 bytes, or
+    # uint32 code points for str
+    if isinstance(strings[0], str):
+        return np.frombuffer("".join(strings).encode("utf-32-le"), dtype=np.uint32)
+    return np.frombuffer(b"".join(strings), dtype=np.uint8)
+
+def _column_lookup(dfa, dtype):
+    # Code unit -> column. For str the last entry is the unknown column and takes
+    # every code point past the largest single-character symbol.
+    if dtype == np.uint8:
+        return np.array([dfa._byte_columns[byte] for byte in range(256)], dtype=np.int32)
+    unknown = dfa.width - 1
+    size = max((ord(symbol) for symbol in dfa.symbol_codes if len(symbol) == 1), default=-1) + 1
+    lookup = np.full(size + 1, unknown, dtype=np.int32)
+    for symbol, code in dfa.symbol_codes.items():
+        if len(symbol) == 1:
+            lookup[ord(symbol)] = code
+    return lookup
+
+def accepts_array(dfa, strings):
+    # dfa.accepts for a batch of strings at once, as a boolean array. Every string
+    # advances one symbol per step with a single gather over the dense table; strings
+    # are sorted longest first so the ones past their own length are a masked-off tail.
+    # The batch is mapped to columns as one flat array and each step gathers its
+    # symbols from there, so there is no padded matrix and, besides len(), no
+    # Python-level work per string.
+    if np is None:
+        raise ImportError("accepts_array requires NumPy")
+    strings = list(strings)
+    if not strings:
+        return np.zeros(0, dtype=bool)
+    lengths = np.fromiter(map(len, strings), dtype=np.intp, count=len(strings))
+    order = np.argsort(-lengths, kind="stable")
+    flat = _code_units(strings)
+    lookup = _column_lookup(dfa, flat.dtype)
+    if flat.dtype != np.uint8:
+        flat = np.minimum(flat, len(lookup) - 1)
+    columns = lookup[flat]
+    # where each string starts in `columns`, longest first; rows past `active` have ended
+    starts = (np.cumsum(lengths) - lengths)[order]
+    sorted_lengths = lengths[order]
+    active = np.searchsorted(-sorted_lengths, -np.arange(sorted_lengths[0]), side="left")
+
+    table = np.frombuffer(dfa.table, dtype=np.int32)
+    offsets = np.zeros(len(strings), dtype=np.int32)
+    for step, count in enumerate(active):
+        offsets[:count] = table.take(offsets[:count] + columns.take(starts[:count] + step))
+
+    finals = np.frombuffer(bytes(dfa.finals), dtype=np.uint8)
+    result = np.empty(len(strings), dtype=bool)
+    result[order] = finals[offsets // dfa.width] != 0
+    return result
@@ -0,0 +1,146 @@
+#bench.py
+import json
+import platform
+import random
+import time
+import tracemalloc
+from regex import parse_regex
+from fa import NFA, DFA, LazyDFA
+
+# Each workload is (name, pattern, inputs); inputs are the strings timed with accepts.
+
+def _random_string(rng, alphabet, length):
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+def blowup(n, input_length=20000):
+    # (a|b)*a(a|b){n}: the DFA needs 2^(n+1) states to remember the last n+1 symbols
+    rng = random.Random(n)
+    return f"blowup_{n}", f"(a|b)*a(a|b){{{n}}}", [_random_string(rng, "ab", input_length)]
+
+def nested_stars(depth, input_length=20000):
+    # (((a*b*)*c*)*d*)*: stars nested depth deep that simplify cannot collapse, matched
+    # on a random input whose last symbol is outside the pattern
+    rng = random.Random(depth)
+    letters = "abcdefghijklmnopqrstuvwxy"[:depth + 1]
+    pattern = letters[0]
+    for letter in letters[1:]:
+        pattern = f"({pattern}*{letter}*)"
+    return f"nested_stars_{depth}", pattern + "*", [_random_string(rng, letters, input_length) + "z"]
+
+def literal_alternation(count, length=8, inputs=2000):
+    rng = random.Random(count)
+    words = [_random_string(rng, "abcdefghijklmnopqrstuvwxyz", length) for _ in range(count)]
+    probes = [rng.choice(words) if i % 2 else _random_string(rng, "abcdefghijklmnopqrstuvwxyz", length)
+              for i in range(inputs)]
+    return f"literal_alternation_{count}", "|".join(words), probes
+
+def large_input(input_length):
+    rng = random.Random(input_length)
+    return f"large_input_{input_length}", "(a|b|c)*abc(a|b|c)*", [_random_string(rng, "abc", input_length)]
+
+def default_workloads():
+    return [
+        blowup(4), blowup(8), blowup(12),
+        nested_stars(4), nested_stars(16),
+        literal_alternation(100), literal_alternation(1000),
+        large_input(100000), large_input(1000000),
+    ]
+
+def _measure(fn, repeat=1):
+    # (seconds per call over `repeat` untraced runs, peak traced bytes of one more run,
+    # result). Timing and tracing are separate runs because tracemalloc slows allocation.
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    seconds = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak, result
+
+def _time_accepts(accepts, inputs, min_seconds):
+    # Repeats the whole input list until min_seconds have passed
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        for input_string in inputs:
+            accepts(input_string)
+        calls += len(inputs)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return calls, elapsed
+
+def run_workload(name, pattern, inputs, engines=("nfa", "dfa", "lazy"), min_seconds=0.2):
+    result = {"name": name, "pattern_length": len(pattern),
+              "inputs": len(inputs), "input_chars": sum(map(len, inputs)), "phases": {}, "accepts": {}}
+    phases = result["phases"]
+
+    seconds, peak, regex = _measure(lambda: parse_regex(pattern))
+    phases["parse_regex"] = {"seconds": seconds, "peak_bytes": peak}
+    seconds, peak, nfa = _measure(lambda: NFA.from_regex(regex))
+    phases["nfa_from_regex"] = {"seconds": seconds, "peak_bytes": peak}
+    seconds, peak, dfa = _measure(lambda: DFA.from_nfa(nfa))
+    phases["dfa_from_nfa"] = {"seconds": seconds, "peak_bytes": peak}
+    result["nfa_states"] = len(nfa.states)
+    result["dfa_states"] = len(dfa.states)
+
+    automata = {"nfa": nfa, "dfa": dfa, "lazy": LazyDFA.from_nfa(nfa)}
+    for kind in engines:
+        calls, elapsed = _time_accepts(automata[kind].accepts, inputs, min_seconds)
+        result["accepts"][kind] = {"calls": calls, "seconds": elapsed, "ops_per_sec": calls / elapsed,
+                                     "chars_per_sec": calls * result["input_chars"] / len(inputs) / elapsed}
+    return result
+
+def run(workloads=None, engines=("nfa", "dfa", "lazy"), min_seconds=0.2):
+    workloads = default_workloads() if workloads is None else workloads
+    return {"python": platform.python_version(),
+            "workloads": [run_workload(name, pattern, inputs, engines, min_seconds)
+                          for name, pattern, inputs in workloads]}
+
+def format_results(results):
+    lines = [f"{'workload':<26}{'nfa':>7}{'dfa':>7}{'parse ms':>10}{'nfa ms':>9}{'dfa ms':>9}{'dfa peak KiB':>14}"
+             + "".join(f"{engine + ' chars/s':>16}" for engine in results["workloads"][0]["accepts"])]
+    for workload in results["workloads"]:
+        phases = workload["phases"]
+        line = (f"{workload['name']:<26}{workload['nfa_states']:>7}{workload['dfa_states']:>7}"
+                f"{phases['parse_regex']['seconds'] * 1000:>10.2f}{phases['nfa_from_regex']['seconds'] * 1000:>9.2f}"
+                f"{phases['dfa_from_nfa']['seconds'] * 1000:>9.2f}{phases['dfa_from_nfa']['peak_bytes'] / 1024:>14.1f}")
+        line += "".join(f"{stats['chars_per_sec']:>16,.0f}" for stats in workload["accepts"].values())
+        lines.append(line)
+    return "\n".join(lines)
+
+def main(args):
+    # args: [--json PATH] [--quick] [workload name prefix ...]. With --json - only the
+    # JSON is printed, so the output can be piped.
+    json_path = None
+    min_seconds = 0.2
+    names = []
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg == "--json" and args:
+            json_path = args.pop(0)
+        elif arg == "--quick":
+            min_seconds = 0.0
+        elif arg.startswith("--"):
+            raise ValueError(f"Unknown bench option: {arg}")
+        else:
+            names.append(arg)
+
+    workloads = [workload for workload in default_workloads()
+                 if not names or any(workload[0].startswith(name) for name in names)]
+    if not workloads:
+        raise ValueError(f"No workload matches {', '.join(names)}")
+    results = run(workloads, min_seconds=min_seconds)
+    if json_path == "-":
+        print(json.dumps(results, indent=2))
+        return results
+    print(format_results(results))
+    if json_path is not None:
+        with open(json_path, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
@@ -0,0 +1,65 @@
+#engine.py
+from collections import OrderedDict, namedtuple
+from regex import parse_regex
+from fa import NFA, DFA, LazyDFA
+from aho import AhoCorasick, split_literal_alternation, literal_alternatives
+
+MODES = ("auto", "nfa", "dfa", "min", "lazy")
+MAX_CACHE_SIZE = 256
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "maxsize", "currsize"])
+
+# (pattern, mode) -> compiled automaton, least recently used first
+_cache = OrderedDict()
+_hits = 0
+_misses = 0
+_evictions = 0
+
+def _build(pattern, mode):
+    match mode:
+        case "auto":
+            # pure literal alternations go to Aho-Corasick, everything else to a DFA
+            literals = split_literal_alternation(pattern)
+            if literals is None:
+                literals = literal_alternatives(parse_regex(pattern))
+            if literals is not None:
+                return AhoCorasick(literals)
+            return compile(pattern, "dfa")
+        case "nfa":
+            return NFA.from_regex(parse_regex(pattern))
+        case "dfa":
+            return DFA.from_nfa(compile(pattern, "nfa"))
+        case "min":
+            return DFA.from_nfa(compile(pattern, "nfa"), minimize=True)
+        case "lazy":
+            return LazyDFA.from_nfa(compile(pattern, "nfa"))
+    raise ValueError(f"Unknown mode: {mode} (expected one of {', '.join(MODES)})")
+
+def compile(pattern, mode="dfa"):
+    # Returns the automaton for pattern, building it only on the first request.
+    # mode is "nfa" (NFA), "dfa" (DFA), "min" (minimized DFA), "lazy" (LazyDFA) or
+    # "auto" (AhoCorasick for pure literal alternations, otherwise the cached "dfa").
+    global _hits, _misses, _evictions
+    key = (pattern, mode)
+    automaton = _cache.get(key)
+    if automaton is not None:
+        _hits += 1
+        _cache.move_to_end(key)
+        return automaton
+
+    _misses += 1
+    automaton = _build(pattern, mode)
+    _cache[key] = automaton
+    while len(_cache) > MAX_CACHE_SIZE:
+        _cache.popitem(last=False)
+        _evictions += 1
+    return automaton
+
+def cache_info():
+    return CacheInfo(_hits, _misses, _evictions, MAX_CACHE_SIZE, len(_cache))
+
+def purge():
+    # Drops every cached automaton and resets the statistics
+    global _hits, _misses, _evictions
+    _cache.clear()
+    _hits = _misses = _evictions = 0
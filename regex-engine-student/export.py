@@ -0,0 +1,169 @@
+#export.py
+import io
+import json
+from collections import deque
+from fa import NFA, DFA, ANY
+
+# Writes automata as Graphviz DOT or JSON straight from their dense tables, one state
+# at a time as a breadth-first walk reaches it, so large DFAs export in linear time
+# without building a graph object first. States are numbered like the tables: the
+# start state is 0, and the dead DFA state is left out.
+
+def symbol_ranges(symbols):
+    # Sorted (first, last) ranges of consecutive single-character symbols; longer
+    # symbols become one-element ranges of their own
+    ranges = []
+    for symbol in sorted(symbols):
+        if ranges and len(symbol) == 1 and len(ranges[-1][1]) == 1 and ord(symbol) == ord(ranges[-1][1]) + 1:
+            ranges[-1][1] = symbol
+        else:
+            ranges.append([symbol, symbol])
+    return [tuple(r) for r in ranges]
+
+def edge_label(ranges, epsilon=False, other=False, complete=False):
+    # "a-cx" for a, b, c and x; "ε" for epsilon moves; "." when every symbol is taken
+    # and "other" for symbols the pattern never names
+    if complete:
+        return "."
+    parts = ["ε"] if epsilon else []
+    parts.append("".join(first if first == last else f"{first}-{last}" for first, last in ranges))
+    if other:
+        parts.append("other")
+    return ",".join(part for part in parts if part)
+
+def _group_by_target(moves):
+    # moves: (target, class code) pairs -> {target: [codes]} in first-seen order
+    grouped = {}
+    for target, code in moves:
+        grouped.setdefault(target, []).append(code)
+    return grouped
+
+def _nfa_graph(nfa):
+    compiled = nfa.compile()
+    num_classes = compiled.num_classes
+    everything = set(range(num_classes))
+
+    def edges(state):
+        moves = ((target, code) for code in range(num_classes)
+                 for target in compiled.move_table[state * num_classes + code])
+        result = []
+        for target in compiled.epsilon_edges[state]:
+            result.append((target, edge_label((), epsilon=True), {"ranges": [], "epsilon": True, "other": False}))
+        for target, codes in _group_by_target(moves).items():
+            symbols = [symbol for code in codes for symbol in compiled.class_symbols[code] if symbol != ANY]
+            other = compiled.other_code in codes
+            ranges = symbol_ranges(symbols)
+            result.append((target, edge_label(ranges, other=other, complete=other and set(codes) == everything),
+                           {"ranges": ranges, "epsilon": False, "other": other}))
+        return result
+
+    return "nfa", compiled.num_states, lambda state: bool(compiled.finals[state]), edges
+
+def _dfa_graph(dfa):
+    rows = dfa._rows
+    width = dfa.width
+    dead = dfa.dead_state
+    unknown = width - 1
+
+    def edges(state):
+        base = state * width
+        moves = ((rows[base + column] // width, column) for column in range(width)
+                 if rows[base + column] // width != dead)
+        result = []
+        for target, columns in _group_by_target(moves).items():
+            symbols = [symbol for column in columns if column != unknown for symbol in dfa.class_symbols[column]]
+            other = unknown in columns
+            ranges = symbol_ranges(symbols)
+            result.append((target, edge_label(ranges, other=other, complete=len(columns) == width),
+                           {"ranges": ranges, "epsilon": False, "other": other}))
+        return result
+
+    return "dfa", dfa.num_states, lambda state: bool(dfa.finals[state]), edges
+
+def _graph(fa):
+    if isinstance(fa, NFA):
+        return _nfa_graph(fa)
+    if isinstance(fa, DFA):
+        return _dfa_graph(fa)
+    raise ValueError(f"Cannot export {type(fa).__name__}")
+
+def walk(fa, start=0, max_depth=None):
+    # Breadth-first (state, is_final, edges) from `start`. States max_depth edges away
+    # are still reported but with edges None, so the subgraph is cut there. A bad
+    # start is rejected here, before the caller has written anything.
+    _, num_states, is_final, edges = _graph(fa)
+    if not 0 <= start < num_states:
+        raise ValueError(f"No state {start} (the automaton has {num_states})")
+    return _walk(start, max_depth, is_final, edges)
+
+def _walk(start, max_depth, is_final, edges):
+    depth_of = {start: 0}
+    pending = deque([start])
+    while pending:
+        state = pending.popleft()
+        depth = depth_of[state]
+        if max_depth is not None and depth >= max_depth:
+            yield state, is_final(state), None
+            continue
+        state_edges = edges(state)
+        for target, _, _ in state_edges:
+            if target not in depth_of:
+                depth_of[target] = depth + 1
+                pending.append(target)
+        yield state, is_final(state), state_edges
+
+def _dot_string(text):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def write_dot(fa, out=None, start=0, max_depth=None):
+    # DOT for the part of fa reachable from `start` within max_depth edges. Writes to
+    # the text file `out`, or returns the text when out is None. Cut-off states are
+    # drawn dashed.
+    if out is None:
+        buffer = io.StringIO()
+        write_dot(fa, buffer, start, max_depth)
+        return buffer.getvalue()
+    kind = _graph(fa)[0]
+    states = walk(fa, start, max_depth)
+    out.write(f"digraph {kind.upper()} {{\n  rankdir=LR;\n  node [shape=circle];\n")
+    out.write(f"  __start [shape=point];\n  __start -> {start};\n")
+    for state, final, edges in states:
+        attributes = []
+        if final:
+            attributes.append("shape=doublecircle")
+        if edges is None:
+            attributes.append("style=dashed")
+        if attributes:
+            out.write(f"  {state} [{', '.join(attributes)}];\n")
+        for target, label, _ in edges or ():
+            out.write(f"  {state} -> {target} [label={_dot_string(label)}];\n")
+    out.write("}\n")
+
+def write_json(fa, out=None, start=0, max_depth=None):
+    # JSON of the same subgraph as write_dot: {"kind", "start", "states": [{"id",
+    # "final", "truncated", "edges": [{"to", "label", "ranges", "epsilon", "other"}]}]},
+    # one state per line.
+    if out is None:
+        buffer = io.StringIO()
+        write_json(fa, buffer, start, max_depth)
+        return buffer.getvalue()
+    kind = _graph(fa)[0]
+    states = walk(fa, start, max_depth)
+    out.write(f'{{"kind": "{kind}", "start": {start}, "states": [\n')
+    separator = ""
+    for state, final, edges in states:
+        record = {"id": state, "final": final, "truncated": edges is None,
+                  "edges": [dict(to=target, label=label, **detail) for target, label, detail in edges or ()]}
+        out.write(separator + json.dumps(record, ensure_ascii=False))
+        separator = ",\n"
+    out.write("\n]}\n")
+
+def export(fa, path, format=None, start=0, max_depth=None):
+    # Writes fa to path as "dot" or "json" (by default chosen from the file extension)
+    format = format or ("json" if path.endswith(".json") else "dot")
+    writers = {"dot": write_dot, "json": write_json}
+    if format not in writers:
+        raise ValueError(f"Unknown export format: {format} (expected dot or json)")
+    walk(fa, start, max_depth)  # checks start before path is truncated
+    with open(path, "w", encoding="utf-8") as f:
+        writers[format](fa, f, start, max_depth)
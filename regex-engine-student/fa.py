@@ -1,30 +1,108 @@
 #fa.py
 #All three test passed
-from regex import parse_regex, RStar, RUnion, RConcat, RSingle, RNoString, RConcat, REmptyString 
-from collections import deque
+from regex import parse_regex, simplify, RStar, RPlus, ROption, RRepeat, RAny, RUnion, RConcat, RSingle, RClass, RNoString, RConcat, REmptyString 
+from prefilter import Prefilter
+import stats
 import string 
+from collections import OrderedDict, deque
+from array import array
+import hashlib
+import mmap
+import os
+import struct
+import sys
 
 SUPPORTED_SYMBOLS = list(string.ascii_lowercase)
 EPSILON = ""
+# Transition label of a wildcard edge (.), which any one symbol can take. It is longer
+# than one character, so no input symbol is ever equal to it.
+ANY = "<any>"
+# Shortest input on which DFA.accepts looks for the prefilter's required literal
+PREFILTER_MIN_LENGTH = 64
+# Most symbols a StreamMatcher holds after a match that may still be extended
+STREAM_MAX_PENDING = 1 << 20
+
+# Compiled DFA file layout (little-endian), see DFA.save:
+#   header: magic, format version, flags, num_states, width, symbol map size, sha256 of the pattern
+#   symbol map: (class code: u32, length: u16, utf-8 symbol) per symbol, padded to 4 bytes
+#   transition table: (num_states + 1) * width int32 row offsets, dead row last
+#   final-state table: num_states + 1 bytes
+DFA_FILE_MAGIC = b"RXDF"
+DFA_FILE_VERSION = 1
+_DFA_FILE_HEADER = struct.Struct("<4sHHIII32s")
+_SYMBOL_ENTRY = struct.Struct("<IH")
+
+def pattern_digest(pattern):
+    return hashlib.sha256(pattern.encode("utf-8")).digest() if pattern is not None else bytes(32)
+
+def symbol_classes(rows):
+    # Partition the alphabet into classes of symbols that no state can tell apart.
+    # rows[i] maps symbol -> (hashable) target of state i. Returns the symbols of each
+    # class and a symbol -> class code map; codes follow the smallest symbol in a class.
+    signatures = {}
+    for i, row in enumerate(rows):
+        for symbol, target in row.items():
+            signatures.setdefault(symbol, []).append((i, target))
+    classes = {}
+    for symbol in sorted(signatures):
+        classes.setdefault(tuple(signatures[symbol]), []).append(symbol)
+    class_symbols = list(classes.values())
+    symbol_codes = {symbol: code for code, symbols in enumerate(class_symbols) for symbol in symbols}
+    return class_symbols, symbol_codes
+
+def finditer_spans(search, length):
+    # Drives search(pos) -> (start, end) or None over an input of this length, resuming
+    # at the end of each match (one past it for an empty match, so the scan advances).
+    position = 0
+    while position <= length:
+        span = search(position)
+        if span is None:
+            return
+        yield span
+        position = span[1] if span[1] > span[0] else span[1] + 1
+
 class NFAState:
-    _id_counter = 0
+    # Ids are handed out by whoever builds the automaton, densely from 0, so the same
+    # pattern always gets the same numbering. Edges are kept flat in one list, symbol
+    # and target alternating in insertion order, rather than as a dict of lists per
+    # state; adding one is a bare append, as Thompson construction never adds the
+    # same edge twice (CompiledNFA drops duplicates anyway). `transitions` rebuilds
+    # the {symbol: [targets]} view when something asks for it.
+    __slots__ = ("id", "is_final", "edges")
 
-    def __init__(self, is_final):
-        self.id = NFAState._id_counter
-        NFAState._id_counter += 1
+    def __init__(self, is_final, state_id):
+        self.id = state_id
         self.is_final = is_final
-        self.transitions = dict()
+        self.edges = []
+
+    @property
+    def transitions(self):
+        transitions = {}
+        edges = self.edges
+        for i in range(0, len(edges), 2):
+            transitions.setdefault(edges[i], []).append(edges[i + 1])
+        return transitions
 
     def add_transition(self, symbol, state):
-        if symbol not in self.transitions:
-            self.transitions[symbol] = set()
-        self.transitions[symbol].add(state)
+        self.edges.append(symbol)
+        self.edges.append(state)
 
 class NFA:
     def __init__(self, start_state, states):
         self.start_state = start_state
         self.states = states
-        self.transition_table = self._make_transition_table()
+        self._transition_table = None
+        self._compiled = None
+        # literal checks done before simulation, set by from_regex
+        self.prefilter = None
+
+    @property
+    def transition_table(self):
+        # {state id: {symbol: set of target ids}}, built on first access since
+        # matching only uses the compiled form
+        if self._transition_table is None:
+            self._transition_table = self._make_transition_table()
+        return self._transition_table
 
     def _make_transition_table(self):
         table = {}
@@ -38,144 +116,408 @@ class NFA:
                 table[state.id] = {}  # Empty dict if no transitions
 
         return table
-    def is_final_state(self, state_id):
-            for state in self.states:
-                if state.id == state_id:
-                    return state.is_final
-            return False
-        
-    def accepts(self, input_string):
-        queue = deque([(self.start_state.id, input_string)])
-
-        while queue:
-            current_state_id, remaining_input = queue.popleft()
-            if not remaining_input and self.is_final_state(current_state_id):
-                return True
+    def compile(self):
+        # The compiled form is built on first use; Thompson construction keeps
+        # rewiring sub-automata, so doing it eagerly would be wasted work.
+        if self._compiled is None:
+            self._compiled = CompiledNFA(self)
+        return self._compiled
 
-            if remaining_input:
-                current_char = remaining_input[0]
-                rest_input = remaining_input[1:]
-
-                if current_state_id not in self.transition_table:
-                    # state is not listed in the table, implying it has no outgoing transitions
-                    # (it is also OK to list a state in the table with an empty dict indicating no outgoing transitions)
-                    continue
+    def is_final_state(self, state_id):
+        return self.compile().is_final_id(state_id)
 
-                if current_char in self.transition_table[current_state_id]:
-                    target_states = self.transition_table[current_state_id][current_char]
-                    for next_state_id in target_states:
-                        queue.append((next_state_id, rest_input))
-                # else no valid transition for this character from this state
+    def accepts(self, input_string):
+        if self.prefilter is not None and self.prefilter.rejects(input_string):
+            return False
+        return self.compile().accepts(input_string)
 
-            if current_state_id in self.transition_table and EPSILON in self.transition_table[current_state_id]:
-                target_states = self.transition_table[current_state_id][EPSILON]
-                for next_state_id in target_states:
-                    queue.append((next_state_id, remaining_input))
+    def search(self, input_string, pos=0):
+        return self.compile().search(input_string, pos, self.prefilter)
 
-        return False
+    def finditer(self, input_string):
+        return self.compile().finditer(input_string, self.prefilter)
 
     """
     This function implements the Thompson Construct from the Dragon Book. 
     You should refer to the book and complete the code based on the given function strucuture.
     """
     @classmethod
+    @stats.timed("nfa_from_regex")
     def from_regex(cls, regex):
-        match regex:
-            case REmptyString():
-                start = NFAState(False)
-                end = NFAState(True)
-                start.add_transition(EPSILON, end)
-                return cls(start, {start, end})
-
-            case RNoString():
-                start = NFAState(False)
-                return cls(start, {start})
-
-            case RSingle():
-                start = NFAState(False)
-                end = NFAState(True)
-                start.add_transition(regex.char, end)
-                return cls(start, {start, end})
-
-            # Implement the concatenation case, aligning with Fig. 3.41 in the Dragon Book
-            case RConcat(left=left, right=right):
-                # Recursively create NFA for each part (N(s) and N(t))
-                nfa_left = cls.from_regex(left)
-                nfa_right = cls.from_regex(right)
-
-                # Find and deactivate the final state of N(s)
-                nfa_left_accept_state = next(state for state in nfa_left.states if state.is_final)
-                nfa_left_accept_state.is_final = False
-
-                # Connect N(s)'s final state to the start of N(t) with epsilon transition
-                nfa_left_accept_state.add_transition(EPSILON, nfa_right.start_state)
-
-                # Combine all states and return the full NFA
-                all_states = nfa_left.states.union(nfa_right.states)
-                return cls(nfa_left.start_state, all_states)
-
-            # Implement the union case, aligning with Fig. 3.40 in the Dragon Book
-            case RUnion(left=left, right=right):
-                # Recursively create NFA for each part (N(s) and N(t))
-                nfa_left = cls.from_regex(left)
-                nfa_right = cls.from_regex(right)
-
-                # Create new start and accept states for the union
-                new_start = NFAState(False)
-                new_accept = NFAState(True)
-
-                # Epsilon transitions from new start to both N(s) and N(t) start states
-                new_start.add_transition(EPSILON, nfa_left.start_state)
-                new_start.add_transition(EPSILON, nfa_right.start_state)
-
-                # Connect each NFA's final state to the new accept state with epsilon transitions
-                nfa_left_accept_state = next(state for state in nfa_left.states if state.is_final)
-                nfa_right_accept_state = next(state for state in nfa_right.states if state.is_final)
-
-                nfa_left_accept_state.is_final = False
-                nfa_right_accept_state.is_final = False
-
-                # Add epsilon transitions from each sub-NFA’s accept state to the new accept
-                nfa_left_accept_state.add_transition(EPSILON, new_accept)
-                nfa_right_accept_state.add_transition(EPSILON, new_accept)
-
-                # Combine all states and return the full NFA
-                all_states = {new_start, new_accept}.union(nfa_left.states).union(nfa_right.states)
-                return cls(new_start, all_states)
-
-            # Implement the star case, aligning with Fig. 3.42 in the Dragon Book
-            case RStar(expr=expr):
-                # Recursively create NFA for the inner expression (N(s))
-                nfa_expr = cls.from_regex(expr)
-
-                # Create new start and accept states for the star operation
-                new_start = NFAState(False)
-                new_accept = NFAState(True)
-
-                # Epsilon transition from new start state to both N(s) start and new accept state
-                new_start.add_transition(EPSILON, nfa_expr.start_state)
-                new_start.add_transition(EPSILON, new_accept)
-
-                # Deactivate the final state of N(s) and create loops back to start
-                nfa_expr_accept_state = next(state for state in nfa_expr.states if state.is_final)
-                nfa_expr_accept_state.is_final = False
-
-                # Loop back from N(s)'s final state to its start, and to the new accept state
-                nfa_expr_accept_state.add_transition(EPSILON, nfa_expr.start_state)
-                nfa_expr_accept_state.add_transition(EPSILON, new_accept)
-
-                # Combine all states and return the full NFA
-                all_states = {new_start, new_accept}.union(nfa_expr.states)
-                return cls(new_start, all_states)
-
-        raise ValueError("Unknown regex type")
+        # Post-order walk with an explicit stack, so pattern depth is unlimited. Each
+        # fragment is a (start, accept) pair, so composing fragments never rescans
+        # or copies state sets, and every state is created exactly once.
+        regex = simplify(regex)
+        states = []
+
+        def new_state():
+            state = NFAState(False, len(states))
+            states.append(state)
+            return state
+
+        def repetition(copies, low, high):
+            # x+, x? and x{low,high} from built copies of x, without desugaring to
+            # x x* or x|"": the first `low` copies are chained, then either the last
+            # one loops back on itself (high is None) or the remaining copies are
+            # nested optionally, x{2,4} = x x (x (x)?)?. Each optional copy can only be
+            # entered right after the previous one, so the NFA never has to guess which
+            # copies were skipped and subset construction stays linear in the count.
+            start = accept = None
+            for copy_start, copy_accept in copies[:low]:
+                if accept is None:
+                    start = copy_start
+                else:
+                    accept.add_transition(EPSILON, copy_start)
+                accept = copy_accept
+            if high is None:
+                loop_start = copies[low - 1][0]
+                end = new_state()
+                accept.add_transition(EPSILON, loop_start)
+                accept.add_transition(EPSILON, end)
+                return start, end
+            if accept is None:
+                start = accept = new_state()
+            if high > low:
+                end = new_state()
+                for copy_start, copy_accept in copies[low:]:
+                    accept.add_transition(EPSILON, copy_start)
+                    accept.add_transition(EPSILON, end)
+                    accept = copy_accept
+                accept.add_transition(EPSILON, end)
+                accept = end
+            return start, accept
+
+        fragments = []
+        stack = [(regex, None)]
+        while stack:
+            node, arity = stack.pop()
+            if arity is None:
+                match node:
+                    case RConcat(left=left, right=right):
+                        stack.append((node, 2))
+                        stack.append((right, None))
+                        stack.append((left, None))
+                        continue
+                    case RUnion():
+                        # Flatten nested unions into one n-ary union, so every alternative
+                        # is a single epsilon edge away from the shared start and accept.
+                        alternatives = []
+                        pending = [node]
+                        while pending:
+                            alternative = pending.pop()
+                            if isinstance(alternative, RUnion):
+                                pending.append(alternative.right)
+                                pending.append(alternative.left)
+                            else:
+                                alternatives.append(alternative)
+                        stack.append((node, len(alternatives)))
+                        stack.extend((alternative, None) for alternative in reversed(alternatives))
+                        continue
+                    case RStar(expr=expr) | RPlus(expr=expr) | ROption(expr=expr):
+                        stack.append((node, 1))
+                        stack.append((expr, None))
+                        continue
+                    case RRepeat(expr=expr, min=low, max=high):
+                        # one independent copy of the sub-automaton per counted occurrence
+                        copies = max(low, 1) if high is None else high
+                        stack.append((node, copies))
+                        stack.extend((expr, None) for _ in range(copies))
+                        continue
+
+            match node:
+                case REmptyString():
+                    start = new_state()
+                    end = new_state()
+                    start.add_transition(EPSILON, end)
+                    fragments.append((start, end))
+
+                case RNoString():
+                    # the accept state is never reached
+                    fragments.append((new_state(), new_state()))
+
+                case RSingle():
+                    start = new_state()
+                    end = new_state()
+                    start.add_transition(node.char, end)
+                    fragments.append((start, end))
+
+                case RClass():
+                    start = new_state()
+                    end = new_state()
+                    for char in sorted(node.chars):
+                        start.add_transition(char, end)
+                    fragments.append((start, end))
+
+                case RAny():
+                    # one wildcard edge rather than an edge per symbol
+                    start = new_state()
+                    end = new_state()
+                    start.add_transition(ANY, end)
+                    fragments.append((start, end))
+
+                # Concatenation, aligning with Fig. 3.41 in the Dragon Book
+                case RConcat():
+                    right_start, right_accept = fragments.pop()
+                    left_start, left_accept = fragments.pop()
+
+                    # Connect N(s)'s accept state to the start of N(t) with epsilon transition
+                    left_accept.add_transition(EPSILON, right_start)
+                    fragments.append((left_start, right_accept))
+
+                # Union, aligning with Fig. 3.40 in the Dragon Book (generalized to n operands)
+                case RUnion():
+                    alternatives = fragments[-arity:]
+                    del fragments[-arity:]
+
+                    # Create new start and accept states for the union
+                    new_start = new_state()
+                    new_accept = new_state()
+
+                    # Epsilon transitions from new start to every N(s_i) start state,
+                    # and from each sub-NFA's accept state to the new accept
+                    for alternative_start, alternative_accept in alternatives:
+                        new_start.add_transition(EPSILON, alternative_start)
+                        alternative_accept.add_transition(EPSILON, new_accept)
+                    fragments.append((new_start, new_accept))
+
+                # Star, aligning with Fig. 3.42 in the Dragon Book
+                case RStar():
+                    expr_start, expr_accept = fragments.pop()
+
+                    # Create new start and accept states for the star operation
+                    new_start = new_state()
+                    new_accept = new_state()
+
+                    # Epsilon transition from new start state to both N(s) start and new accept state
+                    new_start.add_transition(EPSILON, expr_start)
+                    new_start.add_transition(EPSILON, new_accept)
+
+                    # Loop back from N(s)'s accept state to its start, and to the new accept state
+                    expr_accept.add_transition(EPSILON, expr_start)
+                    expr_accept.add_transition(EPSILON, new_accept)
+                    fragments.append((new_start, new_accept))
+
+                case RPlus():
+                    fragments.append(repetition([fragments.pop()], 1, None))
+
+                case ROption():
+                    fragments.append(repetition([fragments.pop()], 0, 1))
+
+                case RRepeat():
+                    copies = fragments[len(fragments) - arity:]
+                    del fragments[len(fragments) - arity:]
+                    fragments.append(repetition(copies, node.min, node.max))
+
+                case _:
+                    raise ValueError("Unknown regex type")
+
+        start, accept = fragments.pop()
+        accept.is_final = True
+        nfa = cls(start, set(states))
+        nfa.prefilter = Prefilter.from_regex(regex)
+        if stats.active is not None:
+            stats.active.add_automaton("nfa", len(states), sum(len(state.edges) // 2 for state in states))
+        return nfa
+
+class CompiledNFA:
+    """
+    Array-backed form of an NFA used for matching and subset construction.
+    States are renumbered densely from 0 (the start state is 0) and a set of states
+    is a frozenset of those ints, so stepping never touches NFAState objects.
+    Epsilon closures are computed at most once per state, the first time a match
+    needs them, so patterns with huge alternations only pay for what they reach.
+    """
+    @stats.timed("compile_nfa")
+    def __init__(self, nfa):
+        ordered = sorted(nfa.states, key=lambda state: (state is not nfa.start_state, state.id))
+        index = {state: i for i, state in enumerate(ordered)}
+
+        self.num_states = len(ordered)
+        self.state_ids = [state.id for state in ordered]
+        self._index_of_id = {state_id: i for i, state_id in enumerate(self.state_ids)}
+
+        # Raw (pre-closure) moves, read straight from the flat edge lists, which may
+        # repeat an edge; symbols with identical moves from every state share a class
+        # code, and everything below is indexed by class.
+        moves = []
+        epsilon_edges = []
+        for state in ordered:
+            edges = state.edges
+            if len(edges) == 2 and edges[0] != EPSILON:
+                # the common case, a single symbol edge
+                moves.append({edges[0]: (index[edges[1]],)})
+                epsilon_edges.append(())
+                continue
+            row = {}
+            epsilon = []
+            for i in range(0, len(edges), 2):
+                if edges[i] == EPSILON:
+                    epsilon.append(index[edges[i + 1]])
+                else:
+                    row.setdefault(edges[i], set()).add(index[edges[i + 1]])
+            moves.append({symbol: tuple(sorted(targets)) for symbol, targets in row.items()})
+            epsilon_edges.append(tuple(dict.fromkeys(epsilon)))
+        # A wildcard edge is taken on every symbol: its targets are added to the moves
+        # of each symbol the pattern names, and ANY keeps its own entry, whose class
+        # (other_code) stands for all symbols the pattern does not name.
+        if any(ANY in row for row in moves):
+            alphabet = {symbol for row in moves for symbol in row if symbol != ANY}
+            for row in moves:
+                wildcard = row.get(ANY)
+                if wildcard is not None:
+                    for symbol in alphabet:
+                        row[symbol] = tuple(sorted(set(row.get(symbol, ())).union(wildcard)))
+        self.class_symbols, self.symbol_codes = symbol_classes(moves)
+        self.symbols = sorted(symbol for symbol in self.symbol_codes if symbol != ANY)
+        self.num_classes = len(self.class_symbols)
+        # class code of symbols outside the alphabet, None when they can never match
+        self.other_code = self.symbol_codes.get(ANY)
+
+        # final-state bitmap, indexed by state
+        self.finals = bytearray(state.is_final for state in ordered)
+        self.final_states = frozenset(i for i, state in enumerate(ordered) if state.is_final)
+
+        self.epsilon_edges = epsilon_edges
+        # move_table[state * num_classes + code] holds the raw targets of `state` on
+        # `code`; step_table caches the epsilon closure of those targets.
+        self.move_table = [()] * (self.num_states * self.num_classes)
+        for i, row in enumerate(moves):
+            base = i * self.num_classes
+            for symbol, targets in row.items():
+                self.move_table[base + self.symbol_codes[symbol]] = targets
+        self.step_table = [None] * len(self.move_table)
+        self.closures = [None] * self.num_states
+
+        self.start_set = self.closure(0)
+
+    def closure(self, i):
+        closure = self.closures[i]
+        if closure is None:
+            if stats.active is not None:
+                stats.active.closures += 1
+            seen = {i}
+            stack = [i]
+            epsilon_edges = self.epsilon_edges
+            while stack:
+                for j in epsilon_edges[stack.pop()]:
+                    if j not in seen:
+                        seen.add(j)
+                        stack.append(j)
+            closure = self.closures[i] = frozenset(seen)
+        return closure
+
+    def _fill_step(self, index):
+        result = set()
+        for target in self.move_table[index]:
+            result.update(self.closure(target))
+        targets = self.step_table[index] = frozenset(result)
+        return targets
+
+    def index_of(self, state_id):
+        # dense index of the NFAState with this id
+        return self._index_of_id[state_id]
+
+    def is_final_id(self, state_id):
+        i = self._index_of_id.get(state_id)
+        return i is not None and bool(self.finals[i])
+
+    def is_final_set(self, state_set):
+        return not self.final_states.isdisjoint(state_set)
+
+    def step(self, state_set, code):
+        step_table = self.step_table
+        width = self.num_classes
+        result = set()
+        for state in state_set:
+            targets = step_table[state * width + code]
+            if targets is None:
+                targets = self._fill_step(state * width + code)
+            result.update(targets)
+        return frozenset(result)
+
+    def run(self, current_set, input_string, start=0):
+        # Thompson/Pike simulation over sets of state indices: O(len(input) * states),
+        # no string copies, and epsilon cycles are folded into the cached closures.
+        # Returns the set of active states after input_string[start:], empty if it died.
+        symbol_codes = self.symbol_codes
+        other = self.other_code
+        recorder = stats.active
+        for position in range(start, len(input_string)):
+            code = symbol_codes.get(input_string[position], other)
+            if code is None:
+                return frozenset()
+            current_set = self.step(current_set, code)
+            if recorder is not None:
+                recorder.add_active(len(current_set))
+            if not current_set:
+                return current_set
+        return current_set
+
+    def accepts(self, input_string):
+        return self.is_final_set(self.run(self.start_set, input_string))
+
+    def search(self, input_string, pos=0, prefilter=None):
+        # Leftmost-longest match inside input_string[pos:] as a (start, end) span, or
+        # None. One left-to-right scan: threads map state -> start of the match they
+        # are following, and a fresh thread is seeded at every position as if the
+        # pattern had an implicit .* prefix. Threads meeting in a state keep the
+        # earlier start, so there are never more threads than states. With a
+        # prefilter, idle stretches are skipped to the next literal candidate. A pos
+        # past the end finds nothing, not even an empty match.
+        if pos > len(input_string) or prefilter is not None and prefilter.first_candidate(input_string, pos) == -1:
+            return None
+        symbol_codes = self.symbol_codes
+        step_table = self.step_table
+        width = self.num_classes
+        finals = self.finals
+        recorder = stats.active
+        threads = {}
+        best = None
+        position = pos
+        while True:
+            if best is None and not threads and prefilter is not None:
+                position = prefilter.next_candidate(input_string, position)
+                if position == -1:
+                    return None
+            if best is None:
+                for state in self.start_set:
+                    threads.setdefault(state, position)
+            if recorder is not None:
+                recorder.add_active(len(threads))
+            for state, start in threads.items():
+                if finals[state] and (best is None or start < best[0] or start == best[0] and position > best[1]):
+                    best = (start, position)
+            if best is not None:
+                # later starts can no longer win
+                threads = {state: start for state, start in threads.items() if start <= best[0]}
+                if not threads:
+                    return best
+            if position == len(input_string):
+                return best
+
+            code = symbol_codes.get(input_string[position], self.other_code)
+            next_threads = {}
+            if code is not None:
+                for state, start in threads.items():
+                    targets = step_table[state * width + code]
+                    if targets is None:
+                        targets = self._fill_step(state * width + code)
+                    for target in targets:
+                        if start < next_threads.get(target, position + 1):
+                            next_threads[target] = start
+            threads = next_threads
+            position += 1
+
+    def finditer(self, input_string, prefilter=None):
+        # Successive non-overlapping leftmost-longest (start, end) spans
+        yield from finditer_spans(lambda pos: self.search(input_string, pos, prefilter), len(input_string))
 
 class DFAState():
-    _id_counter = 0
+    # Like NFAState, ids are dense per automaton and assigned by the builder
+    __slots__ = ("id", "is_final", "transitions")
 
-    def __init__(self, is_final, nfa_states):
-        self.id = DFAState._id_counter
-        DFAState._id_counter += 1
+    def __init__(self, is_final, state_id):
+        self.id = state_id
         self.is_final = is_final
         self.transitions = {}
 
@@ -186,7 +528,19 @@ class DFA:
     def __init__(self, start_state, states):
         self.start_state = start_state
         self.states = states
-        self.transition_table = self._make_transition_table()
+        self._transition_table = None
+        self._make_dense_table()
+        # (states before, states after) when this DFA came out of minimize()
+        self.state_counts = None
+        # literal checks done before matching, carried over from the NFA
+        self.prefilter = None
+
+    @property
+    def transition_table(self):
+        # {state id: {symbol: target id}}, built on first access (None for table-only DFAs)
+        if self._transition_table is None and self.states is not None:
+            self._transition_table = self._make_transition_table()
+        return self._transition_table
 
     def _make_transition_table(self):
         table = {}
@@ -195,65 +549,700 @@ class DFA:
             table[state.id] = transitions
         return table
 
+    def _make_dense_table(self):
+        # Dense [(num_states + 1) x width] table whose entries are premultiplied row
+        # offsets (state * width). Columns are symbol classes; the start state is row 0,
+        # the extra row is the dead state and the extra column stands for symbols
+        # outside the alphabet, which only a wildcard (ANY) edge takes. Everything else
+        # leads to the dead row, so matching needs no branches.
+        ordered = sorted(self.states, key=lambda state: (state is not self.start_state, state.id))
+        index = {state: i for i, state in enumerate(ordered)}
+        self.class_symbols, self.symbol_codes = symbol_classes(
+            [{symbol: index[target] for symbol, target in state.transitions.items() if symbol != ANY}
+             for state in ordered])
+        self.symbols = sorted(self.symbol_codes)
+        self.num_classes = len(self.class_symbols)
+        self.num_states = len(ordered)
+        self.dead_state = self.num_states
+        self.width = width = self.num_classes + 1
+
+        table = array("i", [self.dead_state * width]) * ((self.num_states + 1) * width)
+        for i, state in enumerate(ordered):
+            for code, symbols in enumerate(self.class_symbols):
+                target = state.transitions.get(symbols[0])
+                if target is not None:
+                    table[i * width + code] = index[target] * width
+            target = state.transitions.get(ANY)
+            if target is not None:
+                table[i * width + width - 1] = index[target] * width
+        self.table = table
+        # final-state bitmap, indexed by state (the dead state is never final)
+        self.finals = bytearray(state.is_final for state in ordered) + b"\0"
+        self._make_byte_columns()
+        # built by the first accepts()
+        self._start_link = None
+
+        # The array is the compact canonical table; the interpreter loop indexes a list
+        # copy because reading from a list does not box a new int per step.
+        self._rows = table.tolist()
+
+    def _make_byte_columns(self):
+        # Byte -> column lookup so bytes input is mapped with one bytes.translate call
+        byte_columns = [self.width - 1] * 256
+        for symbol, code in self.symbol_codes.items():
+            if len(symbol) == 1 and ord(symbol) < 256:
+                byte_columns[ord(symbol)] = code
+        self._byte_columns = bytes(byte_columns) if self.width <= 256 else byte_columns
+
+    def _columns_of_bytes(self, data):
+        if isinstance(self._byte_columns, bytes):
+            if isinstance(data, memoryview):
+                data = bytes(data)
+            return data.translate(self._byte_columns)
+        return [self._byte_columns[byte] for byte in data]
+
+    def _make_links(self):
+        # Per-state dicts for accepts(): symbol -> the next state's dict, with each
+        # latin-1 symbol also keyed by its byte value so bytes input needs no decoding.
+        # A wildcard's target is under ANY and final states carry the key EPSILON;
+        # no input symbol equals either. Symbols that lead to the dead state are left
+        # out, or point at an empty dead dict when a wildcard would otherwise take them.
+        rows = self._rows
+        width = self.width
+        dead = self.dead_state
+        links = [{} for _ in range(self.num_states + 1)]
+        for state in range(self.num_states):
+            link = links[state]
+            base = state * width
+            other = rows[base + width - 1] // width
+            if other != dead:
+                link[ANY] = links[other]
+            for symbol, code in self.symbol_codes.items():
+                target = rows[base + code] // width
+                if target != dead or other != dead:
+                    link[symbol] = links[target]
+                    if len(symbol) == 1 and ord(symbol) < 256:
+                        link[ord(symbol)] = links[target]
+            if self.finals[state]:
+                link[EPSILON] = True
+        self._has_wildcard = any(ANY in link for link in links)
+        self._start_link = links[0]
+        return links[0]
+
+    def _accepts_table(self, input_string):
+        # accepts() straight over the dense table, used for table-only DFAs so a
+        # loaded or mmapped table is never copied into per-state objects
+        rows = self._rows
+        dead = self.dead_state * self.width
+        offset = 0
+        if isinstance(input_string, (bytes, bytearray, memoryview)):
+            for column in self._columns_of_bytes(input_string):
+                offset = rows[offset + column]
+                if offset == dead:
+                    return False
+        else:
+            symbol_codes = self.symbol_codes
+            unknown = self.width - 1
+            for symbol in input_string:
+                offset = rows[offset + symbol_codes.get(symbol, unknown)]
+                if offset == dead:
+                    return False
+        return bool(self.finals[offset // self.width])
+
     def accepts(self, input_string):
-        current_state = self.start_state
+        # Only the required-literal check of the prefilter runs here, and only on
+        # inputs of at least PREFILTER_MIN_LENGTH symbols: a wrong prefix dies on its
+        # first symbol anyway, and on short inputs the find costs more than the walk.
+        # DFAs built in memory walk per-state dicts (one lookup per symbol, built on
+        # first use); a symbol without a key raises KeyError, which is the dead state
+        # unless the pattern has wildcard edges.
+        prefilter = self.prefilter
+        if prefilter is not None and len(input_string) >= PREFILTER_MIN_LENGTH and prefilter.lacks_required(input_string):
+            return False
+        link = self._start_link
+        if link is None:
+            if self.states is None:
+                return self._accepts_table(input_string)
+            link = self._make_links()
+        if self._has_wildcard:
+            return self._accepts_wildcard(input_string)
+        try:
+            for symbol in input_string:
+                link = link[symbol]
+        except KeyError:
+            return False
+        return EPSILON in link
+
+    def _accepts_wildcard(self, input_string):
+        # The same walk, taking the wildcard edge (under ANY) on a missing key. Misses
+        # are common here (every symbol .* takes), so they are not exceptions.
+        link = self._start_link
         for symbol in input_string:
-            if symbol in current_state.transitions:
-                current_state = current_state.transitions[symbol]
+            next_link = link.get(symbol)
+            if next_link is None:
+                next_link = link.get(ANY)
+                if next_link is None:
+                    return False
+            link = next_link
+        return EPSILON in link
+
+    def _columns(self, input_string):
+        # the input as a sequence of table columns
+        if isinstance(input_string, (bytes, bytearray, memoryview)):
+            return self._columns_of_bytes(input_string)
+        symbol_codes = self.symbol_codes
+        unknown = self.width - 1
+        return [symbol_codes.get(symbol, unknown) for symbol in input_string]
+
+    def _search(self, input_string, pos):
+        # Same thread scheme as CompiledNFA.search, with row offsets as states: a thread
+        # is seeded at every position (the implicit .* prefix) and threads reaching
+        # the same row keep the earlier start. Symbols are mapped to columns one at a
+        # time as the scan reaches them, so nothing before pos or after the match is
+        # translated and repeated search(s, pos) calls stay linear overall.
+        prefilter = self.prefilter
+        if pos > len(input_string) or prefilter is not None and prefilter.first_candidate(input_string, pos) == -1:
+            return None
+        if isinstance(input_string, str):
+            column_of = self.symbol_codes
+            unknown = self.width - 1
+        else:
+            # bytes, bytearray and memoryview all index to ints
+            column_of = None
+            byte_columns = self._byte_columns
+        rows = self._rows
+        finals = self.finals
+        width = self.width
+        dead = self.dead_state * width
+        threads = {}
+        best = None
+        position = pos
+        while True:
+            if best is None and not threads and prefilter is not None:
+                position = prefilter.next_candidate(input_string, position)
+                if position == -1:
+                    return None
+            if best is None:
+                threads.setdefault(0, position)
+            for offset, start in threads.items():
+                if finals[offset // width] and (best is None or start < best[0] or start == best[0] and position > best[1]):
+                    best = (start, position)
+            if best is not None:
+                # later starts can no longer win
+                threads = {offset: start for offset, start in threads.items() if start <= best[0]}
+                if not threads:
+                    return best
+            if position == len(input_string):
+                return best
+
+            if column_of is not None:
+                column = column_of.get(input_string[position], unknown)
             else:
-                return False  # No valid transition
-        return current_state.is_final
+                column = byte_columns[input_string[position]]
+            next_threads = {}
+            for offset, start in threads.items():
+                target = rows[offset + column]
+                if target != dead and start < next_threads.get(target, position + 1):
+                    next_threads[target] = start
+            threads = next_threads
+            position += 1
+
+    def search(self, input_string, pos=0):
+        # Leftmost-longest match inside input_string[pos:] as a (start, end) span, or None
+        return self._search(input_string, pos)
+
+    def finditer(self, input_string):
+        # Successive non-overlapping leftmost-longest (start, end) spans
+        yield from finditer_spans(lambda pos: self._search(input_string, pos), len(input_string))
+
+    def stream(self, anchored=False, max_pending=STREAM_MAX_PENDING, seekable=False):
+        return StreamMatcher(self, anchored, max_pending, seekable)
+
+    def to_bytes(self, pattern=None):
+        # The dense table in the DFA_FILE_* layout. Passing the source pattern stores
+        # its hash so loading can reject data compiled from a different pattern.
+        symbol_map = bytearray()
+        for symbol in self.symbols:
+            encoded = symbol.encode("utf-8")
+            symbol_map += _SYMBOL_ENTRY.pack(self.symbol_codes[symbol], len(encoded)) + encoded
+        symbol_map += bytes(-len(symbol_map) % 4)
+
+        table = array("i", self.table)
+        if sys.byteorder == "big":
+            table.byteswap()
+
+        header = _DFA_FILE_HEADER.pack(DFA_FILE_MAGIC, DFA_FILE_VERSION, 0, self.num_states,
+                                       self.width, len(symbol_map), pattern_digest(pattern))
+        return b"".join((header, symbol_map, table.tobytes(), bytes(self.finals)))
+
+    def save(self, path, pattern=None):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes(pattern))
 
     @classmethod
-    def from_nfa(cls, nfa):
-        # Helper function to compute the epsilon closure of a set of states
-        def epsilon_closure(states):
-            closure = set(states)
-            stack = list(states)
-            while stack:
-                state = stack.pop()
-                if EPSILON in state.transitions:
-                    for next_state in state.transitions[EPSILON]:
-                        if next_state not in closure:
-                            closure.add(next_state)
-                            stack.append(next_state)
-            return closure
-
-        def move(n_states, a):
-            result = set()
-            for state in n_states:
-                if a in state.transitions:
-                    result.update(state.transitions[a])
-            return result
-
-        # Initialize DFA start state from the epsilon closure of the NFA's start state
-        start_closure = epsilon_closure({nfa.start_state})
-        start_dfa_state = DFAState(is_final=any(s.is_final for s in start_closure), nfa_states=None)  # No need to track nfa_states in DFAState
-        
-        # Use dictionaries to track DFA states and closures
-        dfa_states = {frozenset(start_closure): start_dfa_state}
-        unmarked_states = [start_dfa_state]
-        state_map = {start_dfa_state: start_closure}  # Mapping of DFA states to their closures
+    def load(cls, path, pattern=None):
+        # Maps a file written by save() and matches straight from the mapped table
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_bytes(buffer, pattern, source=path)
+
+    @classmethod
+    def from_bytes(cls, buffer, pattern=None, source="buffer", copy=False):
+        # Matches straight from the table inside buffer, without creating DFAState
+        # objects. The result is table-only: start_state, states and transition_table
+        # are None, so it cannot be minimized or visualized. copy=True reads the table
+        # into a list once, trading the zero-copy view for faster matching.
+        view = memoryview(buffer)
+        if len(view) < _DFA_FILE_HEADER.size:
+            raise ValueError(f"{source} is truncated")
+
+        magic, version, _, num_states, width, map_size, digest = _DFA_FILE_HEADER.unpack_from(view)
+        if magic != DFA_FILE_MAGIC:
+            raise ValueError(f"{source} is not a compiled DFA")
+        if version != DFA_FILE_VERSION:
+            raise ValueError(f"{source} has format version {version}, expected {DFA_FILE_VERSION}")
+        if width < 1:
+            raise ValueError(f"{source} is corrupt (table width {width})")
+        table_size = (num_states + 1) * width * 4
+        if len(view) < _DFA_FILE_HEADER.size + map_size + table_size + num_states + 1:
+            raise ValueError(f"{source} is truncated")
+        if pattern is not None and digest != pattern_digest(pattern):
+            raise ValueError(f"{source} was compiled from a different pattern")
+
+        symbol_codes = {}
+        offset = _DFA_FILE_HEADER.size
+        map_end = offset + map_size
+        while offset + _SYMBOL_ENTRY.size <= map_end:
+            code, length = _SYMBOL_ENTRY.unpack_from(view, offset)
+            if length == 0:
+                break  # padding
+            offset += _SYMBOL_ENTRY.size
+            if offset + length > map_end or code >= width - 1:
+                raise ValueError(f"{source} is corrupt (bad symbol map)")
+            symbol_codes[bytes(view[offset:offset + length]).decode("utf-8")] = code
+            offset += length
+
+        table = view[map_end:map_end + table_size].cast("i")
+        if sys.byteorder == "big":
+            table = array("i", table.tobytes())
+            table.byteswap()
+        # every entry must be the offset of a row, or matching would index out of
+        # the table (or into the middle of a row)
+        limit = num_states * width
+        if any(entry < 0 or entry > limit or entry % width for entry in table):
+            raise ValueError(f"{source} is corrupt (bad transition table)")
+
+        dfa = cls.__new__(cls)
+        dfa.start_state = None
+        dfa.states = None
+        dfa._transition_table = None
+        dfa.state_counts = None
+        dfa.prefilter = None
+        dfa.symbol_codes = symbol_codes
+        dfa.symbols = sorted(symbol_codes)
+        dfa.class_symbols = [[] for _ in range(width - 1)]
+        for symbol in dfa.symbols:
+            dfa.class_symbols[symbol_codes[symbol]].append(symbol)
+        dfa.num_classes = width - 1
+        dfa.num_states = num_states
+        dfa.dead_state = num_states
+        dfa.width = width
+        dfa.table = table
+        dfa.finals = view[map_end + table_size:map_end + table_size + num_states + 1]
+        dfa._make_byte_columns()
+        dfa._rows = table.tolist() if copy else table
+        dfa._start_link = None
+        dfa._buffer = buffer
+        return dfa
+
+    @stats.timed("minimize")
+    def minimize(self):
+        # Hopcroft's partition refinement. Missing transitions go to an implicit dead
+        # state so the automaton is total; the block holding it (every state that can
+        # never accept) is dropped again when the minimal DFA is rebuilt.
+        states = sorted(self.states, key=lambda state: state.id)
+        index = {state: i for i, state in enumerate(states)}
+        dead = len(states)
+        # states treat every symbol of a class alike, so refining on one per class is enough
+        symbols = [class_members[0] for class_members in self.class_symbols]
+        if any(ANY in state.transitions for state in states):
+            symbols.append(ANY)
+
+        # inverse[k][t] lists the states that reach t on symbols[k]
+        inverse = [[[] for _ in range(dead + 1)] for _ in symbols]
+        for k, symbol in enumerate(symbols):
+            for i, state in enumerate(states):
+                target = state.transitions.get(symbol)
+                inverse[k][dead if target is None else index[target]].append(i)
+            inverse[k][dead].append(dead)
+
+        finals = {i for i, state in enumerate(states) if state.is_final}
+        blocks = [block for block in (finals, set(range(dead + 1)) - finals) if block]
+        block_of = [0] * (dead + 1)
+        for b, block in enumerate(blocks):
+            for i in block:
+                block_of[i] = b
+        worklist = set(range(len(blocks)))
+
+        while worklist:
+            splitter = list(blocks[worklist.pop()])
+            for k in range(len(symbols)):
+                touched = {}
+                for t in splitter:
+                    for i in inverse[k][t]:
+                        touched.setdefault(block_of[i], set()).add(i)
+                for b, hit in touched.items():
+                    if len(hit) == len(blocks[b]):
+                        continue
+                    blocks[b] -= hit
+                    blocks.append(hit)
+                    new_b = len(blocks) - 1
+                    for i in hit:
+                        block_of[i] = new_b
+                    if b in worklist or len(hit) <= len(blocks[b]):
+                        worklist.add(new_b)
+                    else:
+                        worklist.add(b)
+
+        # Rebuild one DFAState per live block, in order of their first original state
+        dead_block = block_of[dead]
+        new_states = {}
+        for i, state in enumerate(states):
+            b = block_of[i]
+            if b != dead_block and b not in new_states:
+                new_states[b] = (DFAState(is_final=state.is_final, state_id=len(new_states)), state)
+        for new_state, representative in new_states.values():
+            for symbol, target in representative.transitions.items():
+                target_block = block_of[index[target]]
+                if target_block != dead_block:
+                    new_state.add_transition(symbol, new_states[target_block][0])
+
+        start_block = block_of[index[self.start_state]]
+        if start_block == dead_block:
+            # the language is empty: a lone non-accepting start state
+            start = DFAState(is_final=False, state_id=0)
+            minimized = DFA(start, {start})
+        else:
+            minimized = DFA(new_states[start_block][0], {new_state for new_state, _ in new_states.values()})
+        minimized.state_counts = (len(self.states), len(minimized.states))
+        minimized.prefilter = self.prefilter
+        if stats.active is not None:
+            stats.active.add_automaton("minimized_dfa", len(minimized.states),
+                                       sum(len(state.transitions) for state in minimized.states))
+        return minimized
+
+    @classmethod
+    @stats.timed("dfa_from_nfa")
+    def from_nfa(cls, nfa, minimize=False):
+        # Subset construction over the compiled NFA: each DFA state is keyed by the
+        # frozenset of NFA state indices it stands for, closures come from the cache.
+        compiled = nfa.compile()
+
+        start_set = compiled.start_set
+        start_dfa_state = DFAState(is_final=compiled.is_final_set(start_set), state_id=0)
+
+        # Use dictionaries to track DFA states and the NFA state sets they represent
+        dfa_states = {start_set: start_dfa_state}
+        unmarked_states = [(start_dfa_state, start_set)]
 
         # Process each DFA state
         while unmarked_states:
-            current_dfa_state = unmarked_states.pop()
-            current_closure = state_map[current_dfa_state]
-
-            for symbol in SUPPORTED_SYMBOLS:
-                new_closure = epsilon_closure(move(current_closure, symbol))
-                if new_closure:
-                    frozen_closure = frozenset(new_closure)
-
-                    # Check if this closure set already has a DFA state
-                    if frozen_closure not in dfa_states:
-                        is_final = any(s.is_final for s in new_closure)
-                        new_dfa_state = DFAState(is_final=is_final, nfa_states=None)
-                        dfa_states[frozen_closure] = new_dfa_state
-                        unmarked_states.append(new_dfa_state)
-                        state_map[new_dfa_state] = new_closure
-                    # Add the transition for the current DFA state
-                    current_dfa_state.add_transition(symbol, dfa_states[frozen_closure])
+            current_dfa_state, current_set = unmarked_states.pop()
+
+            for code, symbols in enumerate(compiled.class_symbols):
+                new_set = compiled.step(current_set, code)
+                if new_set:
+                    # Check if this state set already has a DFA state
+                    if new_set not in dfa_states:
+                        new_dfa_state = DFAState(is_final=compiled.is_final_set(new_set), state_id=len(dfa_states))
+                        dfa_states[new_set] = new_dfa_state
+                        unmarked_states.append((new_dfa_state, new_set))
+                    # Add the transition for every symbol of the class
+                    for symbol in symbols:
+                        current_dfa_state.add_transition(symbol, dfa_states[new_set])
 
         # Return the DFA with all constructed states
-        return cls(start_dfa_state, set(dfa_states.values()))
+        dfa = cls(start_dfa_state, set(dfa_states.values()))
+        dfa.prefilter = nfa.prefilter
+        if stats.active is not None:
+            # every DFA state is taken off the worklist exactly once
+            stats.active.subset_iterations += len(dfa_states)
+            stats.active.add_automaton("dfa", len(dfa.states), sum(len(state.transitions) for state in dfa.states))
+        return dfa.minimize() if minimize else dfa
+
+
+class LazyDFA:
+    """
+    On-demand DFA over a compiled NFA, in the style of RE2. DFA states (NFA state
+    sets) are only created when a match reaches them and live in a bounded,
+    LRU-evicted cache. If the cache thrashes, matching falls back to NFA simulation.
+    """
+    def __init__(self, nfa, max_states=1024):
+        self.compiled = nfa.compile()
+        self.prefilter = nfa.prefilter
+        self.max_states = max_states
+        # NFA state set -> next state set per class code (None until first taken),
+        # followed by the state set itself, so rows can hold the cached key objects
+        self._cache = OrderedDict()
+        self.evictions = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_nfa(cls, nfa, max_states=1024):
+        return cls(nfa, max_states)
+
+    @property
+    def num_cached_states(self):
+        return len(self._cache)
+
+    def _row(self, state_set):
+        row = self._cache.get(state_set)
+        if row is None:
+            row = [None] * self.compiled.num_classes + [state_set]
+            self._cache[state_set] = row
+            if len(self._cache) > self.max_states:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+                if stats.active is not None:
+                    stats.active.event("eviction", cached_states=len(self._cache))
+        else:
+            self._cache.move_to_end(state_set)
+        return row
+
+    def run(self, input_string):
+        # Returns the set of NFA states active after the whole input (empty if it died)
+        compiled = self.compiled
+        symbol_codes = compiled.symbol_codes
+        other = compiled.other_code
+        current_set = compiled.start_set
+        row = self._row(current_set)
+        misses = 0
+
+        # consumed counts the symbols looked up in the cache, for the stats only
+        for position, symbol in enumerate(input_string):
+            code = symbol_codes.get(symbol, other)
+            if code is None:
+                current_set = frozenset()
+                consumed = position
+                break
+            next_set = row[code]
+            if next_set is None:
+                next_set = compiled.step(current_set, code)
+                if next_set:
+                    # keep the key object already in the cache, so that looking the
+                    # row up again matches by identity instead of comparing sets
+                    next_set = self._row(next_set)[-1]
+                row[code] = next_set
+                misses += 1
+                # Once the cache has been refilled and we still build a new transition
+                # for most input symbols, caching is pure overhead: finish on the NFA.
+                if self.evictions and misses > self.max_states and 2 * misses > position:
+                    self.fallbacks += 1
+                    if stats.active is not None:
+                        stats.active.event("fallback", position=position + 1)
+                    current_set = compiled.run(next_set, input_string, position + 1)
+                    consumed = position + 1
+                    break
+            current_set = next_set
+            if not current_set:
+                consumed = position + 1
+                break
+            row = self._row(current_set)
+        else:
+            consumed = len(input_string)
+
+        if stats.active is not None:
+            stats.active.cache_hits += consumed - misses
+            stats.active.cache_misses += misses
+        return current_set
+
+    def accepts(self, input_string):
+        if self.prefilter is not None and self.prefilter.rejects(input_string):
+            return False
+        return self.compiled.is_final_set(self.run(input_string))
+
+
+class StreamMatcher:
+    """
+    Resumable matcher over a DFA for input that arrives in chunks (str or bytes).
+    Unanchored, feed() returns the finditer() spans completed so far, with absolute
+    offsets, so matches may cross chunk boundaries. Anchored, it only tracks whether
+    everything fed so far matches and finish() returns [(0, length)] if it does.
+    Between chunks only the current state(s) and the running offset are kept, plus
+    the symbols after a match that may still be extended, which are rescanned once
+    the match is final. While some thread can still extend the best match, every
+    symbol since its end is held (a|ab*c fed "a" and then n "b"s keeps n), so
+    unanchored matching is only constant-memory up to max_pending held symbols:
+    past that, feed() raises ValueError rather than grow. max_pending=None removes
+    the limit. Anchored matching keeps a single state and is always constant-memory.
+
+    A caller that can read its input again passes seekable=True, and nothing is
+    held: when a match turns out to end before the current chunk, feed() (or
+    finish()) returns early, and the input must be fed again from self.offset
+    (then finish() called again at the end). scan_file works this way.
+    """
+    def __init__(self, dfa, anchored=False, max_pending=STREAM_MAX_PENDING, seekable=False):
+        self.dfa = dfa
+        self.anchored = anchored
+        self.max_pending = max_pending
+        self.seekable = seekable
+        self.offset = 0
+        self._state = 0
+        # row offset -> start of the match that thread follows
+        self._threads = {}
+        self._best = None
+        self._search_pos = 0
+        # columns from the end of the best match so far, and columns queued for rescan
+        self._pending = deque()
+        self._replay = deque()
+
+    def feed(self, chunk):
+        dfa = self.dfa
+        columns = dfa._columns(chunk)
+        if self.anchored:
+            rows = dfa._rows
+            state = self._state
+            for column in columns:
+                state = rows[state + column]
+            self._state = state
+            self.offset += len(columns)
+            return []
+
+        matches = []
+        if self.seekable:
+            chunk_start = self.offset
+            position = 0
+            while position < len(columns):
+                if self._visit(matches):
+                    # rescan from the end of the emitted match, if this chunk holds it
+                    position = self.offset - chunk_start
+                    if position < 0:
+                        return matches
+                    continue
+                self._step(columns[position])
+                position += 1
+            return matches
+
+        replay = self._replay
+        for column in columns:
+            replay.append(column)
+            while replay:
+                self._consume(replay.popleft(), matches)
+        return matches
+
+    def finish(self):
+        if self.anchored:
+            return [(0, self.offset)] if self.dfa.finals[self._state // self.dfa.width] else []
+
+        matches = []
+        end = self.offset
+        while self._visit(matches, at_end=True):
+            if self.seekable:
+                if self.offset < end:
+                    return matches
+                continue
+            self._rewind()
+            while self._replay:
+                self._consume(self._replay.popleft(), matches)
+        return matches
+
+    def _rewind(self, column=None):
+        # queue the symbols after the emitted match (then `column`) for rescanning
+        if column is not None:
+            self._replay.appendleft(column)
+        self._replay.extendleft(reversed(self._pending))
+        self._pending.clear()
+
+    def _visit(self, matches, at_end=False):
+        # Seeds, checks and prunes threads at self.offset like DFA._search.
+        # Returns True when a match was emitted and the offset moved back to its end.
+        dfa = self.dfa
+        width = dfa.width
+        if self._best is None and self.offset >= self._search_pos:
+            self._threads.setdefault(0, self.offset)
+        best = self._best
+        for offset, start in self._threads.items():
+            if dfa.finals[offset // width] and (best is None or start < best[0] or start == best[0] and self.offset > best[1]):
+                best = (start, self.offset)
+        if best is None:
+            return False
+        if best != self._best:
+            self._best = best
+            self._pending.clear()
+        self._threads = {offset: start for offset, start in self._threads.items() if start <= best[0]}
+        if self._threads and not at_end:
+            return False
+
+        matches.append(best)
+        start, end = best
+        self._threads = {}
+        self._best = None
+        self.offset = end
+        self._search_pos = end if end > start else end + 1
+        return True
+
+    def _consume(self, column, matches):
+        if self._visit(matches):
+            self._rewind(column)
+            return
+        self._step(column)
+        if self._best is not None:
+            self._pending.append(column)
+            if self.max_pending is not None and len(self._pending) > self.max_pending:
+                raise ValueError(f"Match at {self._best[0]} may still be extended after "
+                                 f"{self.max_pending} more symbols (max_pending)")
+
+    def _step(self, column):
+        rows = self.dfa._rows
+        dead = self.dfa.dead_state * self.dfa.width
+        next_threads = {}
+        for offset, start in self._threads.items():
+            target = rows[offset + column]
+            if target != dead and start < next_threads.get(target, self.offset + 1):
+                next_threads[target] = start
+        self._threads = next_threads
+        self.offset += 1
+
+
+def scan_file(dfa, path, anchored=False, chunk_size=1 << 20, use_mmap=False):
+    # Yields the spans a StreamMatcher reports over a file, reading it through one
+    # fixed-size buffer (or windows of an mmap), so memory does not grow with the file.
+    # The matcher is seekable: instead of holding the symbols after a match that may
+    # still be extended, the file is read again from the match's end when needed.
+    # Empty files cannot be mapped, so they always take the buffered path.
+    matcher = dfa.stream(anchored, seekable=True)
+    with open(path, "rb") as f:
+        if use_mmap and os.fstat(f.fileno()).st_size:
+            # the view is released even when the caller stops early, or closing the
+            # map would fail with exported pointers
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                yield from _scan_seekable(matcher, lambda position: view[position:position + chunk_size])
+        else:
+            buffer = bytearray(chunk_size)
+            view = memoryview(buffer)
+
+            def read(position):
+                f.seek(position)
+                return view[:f.readinto(buffer)]
+
+            yield from _scan_seekable(matcher, read)
+
+def _scan_seekable(matcher, read):
+    # Feeds a seekable StreamMatcher from read(position), which returns the chunk
+    # starting at position (empty at the end), going back whenever it asks to rescan
+    position = 0
+    while True:
+        chunk = read(position)
+        if len(chunk):
+            position += len(chunk)
+            matches = matcher.feed(chunk)
+            done = False
+        else:
+            matches = matcher.finish()
+            done = matcher.offset == position
+        # no slice of an mmap may outlive the map
+        del chunk
+        yield from matches
+        if done:
+            return
+        position = matcher.offset
@@ -1,16 +1,9 @@
 #main.py
 import sys
-from regex import parse_regex 
-from fa import NFA, DFA
-try:
-    from visualize import convert_to_visual_fa
-    __has_visual_fa = True
+import engine
+from visualize import convert_to_visual_fa, has_automathon as __has_visual_fa
 
-except ImportError:
-    print("We won't be able to visualize the NFA")
-    __has_visual_fa = False
-
-from test import test_regexpr_str, test_nfa, test_dfa
+from test import test_regexpr_str, test_nfa, test_dfa, run_engine_tests
 
 def print_usage_and_exit():
     print("""Usage:
@@ -19,11 +12,26 @@ def print_usage_and_exit():
                     1 - test_regexpr_str
                     2 - test_regexpr_str, test_nfa
                     3 - test_regexpr_str, test_nfa, test_dfa
+                    4 - all of the above, plus the engine tests (run_engine_tests)
                     Example: python3 main.py test 3
 
+              python3 main.py bench [--quick] [--json <path|->] [workload ...]
+                  Time parsing, construction and matching on the benchmark workloads
+                  (optionally only those whose name starts with one of the given
+                  prefixes) and report state counts, throughput and peak memory.
+                  With --json - only the JSON is printed.
+                  Example: python3 main.py bench blowup --json bench.json
+
               python3 main.py visual {nfa|dfa} <regex>
-                  Generate and visualize an NFA or DFA from the provided regex.
+                  Generate and visualize an NFA or DFA from the provided regex
+                  (needs automathon).
                   Example: python3 main.py visual nfa "a*ba"
+
+              python3 main.py export {nfa|dfa|min} <regex> [--format dot|json]
+                                     [--from <state>] [--depth <n>] [--output <path>]
+                  Write the automaton as Graphviz DOT (default) or JSON, to stdout or
+                  a file, optionally only the states within <n> edges of <state>.
+                  Example: python3 main.py export dfa "(a|b)*abb" --depth 2
             """)
     sys.exit(1)
 
@@ -42,24 +50,62 @@ if __name__ == "__main__":
             test_regexpr_str()
             test_nfa()
             test_dfa()
+        elif "4" in args[1:]:
+            test_regexpr_str()
+            test_nfa()
+            test_dfa()
+            run_engine_tests()
         else:
             print_usage_and_exit()
 
-    elif args[0] == "visual" and __has_visual_fa:
+    elif args[0] == "bench":
+        import bench
+        try:
+            bench.main(args[1:])
+        except ValueError as e:
+            print(e)
+            print_usage_and_exit()
+
+    elif args[0] == "export":
+        import export
+        if len(args) < 3 or args[1] not in ("nfa", "dfa", "min") or len(args) % 2 == 0:
+            print_usage_and_exit()
+        options = dict(zip(args[3::2], args[4::2]))
+        if not set(options) <= {"--format", "--from", "--depth", "--output"}:
+            print_usage_and_exit()
+        if options.get("--format", "dot") not in ("dot", "json"):
+            print_usage_and_exit()
+        try:
+            fa = engine.compile(args[2], mode=args[1])
+            start = int(options.get("--from", 0))
+            depth = int(options["--depth"]) if "--depth" in options else None
+            if "--output" in options:
+                export.export(fa, options["--output"], options.get("--format"), start, depth)
+            else:
+                writer = export.write_json if options.get("--format") == "json" else export.write_dot
+                writer(fa, sys.stdout, start, depth)
+        except ValueError as e:
+            print(e)
+            print_usage_and_exit()
+
+    elif args[0] == "visual" and not __has_visual_fa:
+        print("The 'automathon' dependency is not installed; use 'python3 main.py export' instead")
+        sys.exit(1)
+
+    elif args[0] == "visual":
         try:
             if len(args) != 3:
                 print_usage_and_exit()
                 
             fa_type, regex_str = args[1], args[2]
-            parsed_regex = parse_regex(regex_str)
             if fa_type == "nfa":
-                nfa = NFA.from_regex(parsed_regex)
+                nfa = engine.compile(regex_str, mode="nfa")
                 visual_nfa = convert_to_visual_fa(nfa)
                 visual_nfa.view("NFA_Visualization " + regex_str)
 
             elif fa_type == "dfa":
-                nfa = NFA.from_regex(parsed_regex)
-                dfa = DFA.from_nfa(nfa)
+                nfa = engine.compile(regex_str, mode="nfa")
+                dfa = engine.compile(regex_str, mode="dfa")
                 visual_nfa = convert_to_visual_fa(nfa)
                 visual_nfa.view("NFA_Visualization " + regex_str)
                 visual_dfa = convert_to_visual_fa(dfa)
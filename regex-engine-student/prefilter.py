@@ -0,0 +1,172 @@
+#prefilter.py
+from regex import RegExpr, REmptyString, RSingle, RConcat, RUnion, RStar, RPlus, ROption, RRepeat
+
+class LiteralInfo:
+    # What is known about every string a sub-expression matches: `exact` is the one
+    # string it matches (None if there can be several), and every match starts with
+    # `prefix`, ends with `suffix` and contains `required`.
+    def __init__(self, exact, prefix, suffix, required):
+        self.exact = exact
+        self.prefix = prefix
+        self.suffix = suffix
+        self.required = required
+
+NOTHING_KNOWN = LiteralInfo(None, "", "", "")
+
+def _common_prefix(a, b):
+    n = 0
+    while n < min(len(a), len(b)) and a[n] == b[n]:
+        n += 1
+    return a[:n]
+
+def _common_suffix(a, b):
+    return _common_prefix(a[::-1], b[::-1])[::-1]
+
+def _longest(*literals):
+    return max(literals, key=len)
+
+def _combine(node, children):
+    match node:
+        case REmptyString():
+            return LiteralInfo("", "", "", "")
+
+        case RSingle():
+            return LiteralInfo(node.char, node.char, node.char, node.char)
+
+        case RConcat():
+            left, right = children
+            exact = left.exact + right.exact if left.exact is not None and right.exact is not None else None
+            prefix = left.exact + right.prefix if left.exact is not None else left.prefix
+            suffix = left.suffix + right.exact if right.exact is not None else right.suffix
+            return LiteralInfo(exact, prefix, suffix, _longest(left.required, right.required, left.suffix + right.prefix))
+
+        case RUnion():
+            left, right = children
+            if left.exact is not None and left.exact == right.exact:
+                return left
+            # a literal both sides require is required; try the shorter inside the longer
+            shorter, longer = sorted((left.required, right.required), key=len)
+            required = shorter if shorter in longer else ""
+            prefix = _common_prefix(left.prefix, right.prefix)
+            suffix = _common_suffix(left.suffix, right.suffix)
+            return LiteralInfo(None, prefix, suffix, _longest(required, prefix, suffix))
+
+        case RPlus():
+            inner, = children
+            return LiteralInfo(None, inner.prefix, inner.suffix, inner.required)
+
+        case RRepeat() if node.min > 0:
+            inner, = children
+            if inner.exact is not None and node.min == node.max:
+                exact = inner.exact * node.min
+                return LiteralInfo(exact, exact, exact, exact)
+            return LiteralInfo(None, inner.prefix, inner.suffix, inner.required)
+
+    # RNoString, RAny, RStar, ROption, optional RRepeat and anything unknown: no literal is guaranteed
+    return NOTHING_KNOWN
+
+def _children(node):
+    match node:
+        case RConcat(left=left, right=right) | RUnion(left=left, right=right):
+            return (left, right)
+        case RStar(expr=expr) | RPlus(expr=expr) | ROption(expr=expr) | RRepeat(expr=expr):
+            return (expr,)
+    return ()
+
+def literal_info(regex: RegExpr) -> LiteralInfo:
+    # Post-order walk with an explicit stack, like NFA.from_regex
+    results = []
+    stack = [(regex, False)]
+    while stack:
+        node, children_done = stack.pop()
+        children = _children(node)
+        if children and not children_done:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children))
+            continue
+        child_infos = results[len(results) - len(children):]
+        del results[len(results) - len(children):]
+        results.append(_combine(node, child_infos))
+    return results.pop()
+
+def _find_in_view(view, needle, pos):
+    # memoryview has no find(), and copying the whole view on every call makes a
+    # search that keeps asking for the next candidate quadratic. Copy windows that
+    # double in size instead, overlapping by len(needle) - 1 bytes, so a call only
+    # copies about twice the distance to the occurrence it finds.
+    window = 4 * len(needle) + 256
+    while pos + len(needle) <= len(view):
+        end = min(pos + window, len(view))
+        found = bytes(view[pos:end]).find(needle)
+        if found != -1:
+            return pos + found
+        if end == len(view):
+            break
+        pos = end - len(needle) + 1
+        window *= 2
+    return -1
+
+
+class Prefilter:
+    """
+    Literal checks run before an automaton: inputs that lack the required literal are
+    rejected with one str.find / bytes.find, and a search only starts at positions
+    where the required prefix occurs. Bytes input is read as latin-1, like the DFA.
+    """
+    def __init__(self, prefix, required):
+        self.prefix = prefix
+        # a required literal inside the prefix is already checked by the prefix
+        self.required = "" if required in prefix else required
+        self._bytes = {literal: self._encode(literal) for literal in (prefix, required)}
+
+    @staticmethod
+    def _encode(literal):
+        try:
+            return literal.encode("latin-1")
+        except UnicodeEncodeError:
+            return None  # can never occur in bytes input
+
+    @classmethod
+    def from_regex(cls, regex):
+        # None when the pattern guarantees no literal worth checking
+        info = literal_info(regex)
+        if not info.prefix and not info.required:
+            return None
+        return cls(info.prefix, info.required)
+
+    def _find(self, literal, input_string, pos):
+        if isinstance(input_string, str):
+            return input_string.find(literal, pos)
+        needle = self._bytes[literal]
+        if needle is None:
+            return -1
+        if isinstance(input_string, memoryview):
+            return _find_in_view(input_string, needle, pos)
+        return input_string.find(needle, pos)
+
+    def _starts_with(self, literal, input_string):
+        if isinstance(input_string, str):
+            return input_string.startswith(literal)
+        needle = self._bytes[literal]
+        return needle is not None and bytes(input_string[:len(needle)]) == needle
+
+    def rejects(self, input_string):
+        # True if input_string cannot match the whole pattern
+        if self.prefix and not self._starts_with(self.prefix, input_string):
+            return True
+        return self.lacks_required(input_string)
+
+    def lacks_required(self, input_string):
+        # True if input_string does not contain the required literal
+        return bool(self.required) and self._find(self.required, input_string, 0) == -1
+
+    def first_candidate(self, input_string, pos):
+        # Earliest position >= pos where a match can start, or -1 if none can
+        if self.required and self._find(self.required, input_string, pos) == -1:
+            return -1
+        return self.next_candidate(input_string, pos)
+
+    def next_candidate(self, input_string, pos):
+        if not self.prefix:
+            return pos
+        return self._find(self.prefix, input_string, pos)
@@ -1,14 +1,55 @@
 #regex.py
 from collections import deque
 from abc import ABC, abstractmethod
+import stats
 """
 RegExpr
 """
 class RegExpr(ABC):
+    __match_args__ = ()
+    # the __match_args__ that hold sub-expressions; the others hold plain data
+    _child_names = ()
+
     @abstractmethod
     def __str__(self):
         pass
 
+    def _children(self):
+        return tuple(getattr(self, name) for name in self._child_names)
+
+    def _data(self):
+        return tuple(getattr(self, name) for name in self.__match_args__ if name not in self._child_names)
+
+    def __eq__(self, other):
+        # Structural equality, walked with an explicit stack so deep trees are fine
+        if not isinstance(other, RegExpr):
+            return NotImplemented
+        stack = [(self, other)]
+        while stack:
+            left, right = stack.pop()
+            if left is right:
+                continue
+            if type(left) is not type(right) or hash(left) != hash(right) or left._data() != right._data():
+                return False
+            stack.extend(zip(left._children(), right._children()))
+        return True
+
+    def __hash__(self):
+        # Structural hash, computed bottom-up once and cached on each node
+        stack = [self]
+        while stack:
+            node = stack[-1]
+            if "_hash" in node.__dict__:
+                stack.pop()
+                continue
+            pending = [child for child in node._children() if "_hash" not in child.__dict__]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            node._hash = hash((type(node).__name__,) + node._data() + tuple(child._hash for child in node._children()))
+        return self._hash
+
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
         if "__str__" not in cls.__dict__:
@@ -33,6 +74,7 @@ class RSingle(RegExpr):
 
 class RConcat(RegExpr):
     __match_args__ = ("left", "right")
+    _child_names = __match_args__
 
     def __init__(self, left: RegExpr, right: RegExpr):
         self.left = left
@@ -43,6 +85,7 @@ class RConcat(RegExpr):
 
 class RUnion(RegExpr):
     __match_args__ = ("left", "right")
+    _child_names = __match_args__
 
     def __init__(self, left: RegExpr, right: RegExpr):
         self.left = left
@@ -53,6 +96,7 @@ class RUnion(RegExpr):
 
 class RStar(RegExpr):
     __match_args__ = ("expr",)
+    _child_names = __match_args__
 
     def __init__(self, expr: RegExpr):
         self.expr = expr
@@ -62,6 +106,7 @@ class RStar(RegExpr):
 
 class RPlus(RegExpr):
     __match_args__ = ("expr",)
+    _child_names = __match_args__
 
     def __init__(self, expr: RegExpr):
         self.expr = expr
@@ -71,6 +116,7 @@ class RPlus(RegExpr):
 
 class ROption(RegExpr):
     __match_args__ = ("expr",)
+    _child_names = __match_args__
 
     def __init__(self, expr: RegExpr):
         self.expr = expr
@@ -78,70 +124,295 @@ class ROption(RegExpr):
     def __str__(self):
         return f"ROption({self.expr})"
 
+class RRepeat(RegExpr):
+    # Counted repetition expr{min,max}; max is None when unbounded
+    __match_args__ = ("expr", "min", "max")
+    _child_names = ("expr",)
+
+    def __init__(self, expr: RegExpr, min: int, max: int | None):
+        self.expr = expr
+        self.min = min
+        self.max = max
+
+    def __str__(self):
+        return f"RRepeat({self.expr},{self.min},{self.max})"
+
 class RAny(RegExpr):
     def __str__(self):
         return "RAny"
+
+class RClass(RegExpr):
+    # One character out of a set; produced by simplify() from unions of single characters
+    __match_args__ = ("chars",)
+
+    def __init__(self, chars):
+        self.chars = frozenset(chars)
+
+    def __str__(self):
+        return f"RClass('{''.join(sorted(self.chars))}')"
+
+
+"""
+Simplification
+"""
+@stats.timed("simplify")
+def simplify(regex: RegExpr) -> RegExpr:
+    # Rewrites the tree bottom-up into a smaller equivalent one before NFA construction:
+    #   - unions are flattened, deduplicated (a|a), put in a canonical order so
+    #     (a|b)|(b|a) collapses, and their single characters merged into one RClass
+    #   - RNoString is dropped from unions and absorbs concatenations, REmptyString
+    #     is dropped from concatenations and from unions that already match ""
+    #   - nested repetition collapses: (a*)*, (a+)*, (a?)* and (a|)* become a*
+    #   - counted repetitions that are really *, +, ? or a single copy become those
+    # Nodes are hash-consed, so equal subtrees become one shared object.
+    interned = {}
+    order = {}
+
+    def intern(node):
+        key = (type(node),) + node._data() + tuple(id(child) for child in node._children())
+        existing = interned.get(key)
+        if existing is None:
+            existing = interned[key] = node
+            order[id(node)] = len(order)
+        return existing
+
+    def operands(node, kind):
+        # leaves of a (simplified, so left-deep) chain of `kind` nodes, left to right
+        leaves = []
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            if type(current) is kind:
+                pending.append(current.right)
+                pending.append(current.left)
+            else:
+                leaves.append(current)
+        return leaves
+
+    def make_union(alternatives):
+        chars = set()
+        has_any = False
+        unique = {}
+        for alternative in alternatives:
+            match alternative:
+                case RNoString():
+                    continue
+                case RSingle(char=char):
+                    chars.add(char)
+                case RClass(chars=class_chars):
+                    chars.update(class_chars)
+                case RAny():
+                    has_any = True
+                    unique[id(alternative)] = alternative
+                case _:
+                    unique[id(alternative)] = alternative
+        if chars and not has_any:
+            merged = intern(RSingle(next(iter(chars))) if len(chars) == 1 else RClass(chars))
+            unique[id(merged)] = merged
+        alternatives = list(unique.values())
+        if any(type(alternative) in (RStar, ROption) for alternative in alternatives):
+            alternatives = [alternative for alternative in alternatives if type(alternative) is not REmptyString]
+
+        if not alternatives:
+            return intern(RNoString())
+        alternatives.sort(key=lambda alternative: order[id(alternative)])
+        result = alternatives[0]
+        for alternative in alternatives[1:]:
+            result = intern(RUnion(result, alternative))
+        return result
+
+    def make_concat(parts):
+        parts = [part for part in parts if type(part) is not REmptyString]
+        if any(type(part) is RNoString for part in parts):
+            return intern(RNoString())
+        if not parts:
+            return intern(REmptyString())
+        result = parts[0]
+        for part in parts[1:]:
+            result = intern(RConcat(result, part))
+        return result
+
+    def make_star(expr):
+        match expr:
+            case RNoString() | REmptyString():
+                return intern(REmptyString())
+            case RStar():
+                return expr
+            case RPlus(expr=inner) | ROption(expr=inner):
+                return make_star(inner)
+            case RRepeat(expr=inner, min=low) if low <= 1:
+                return make_star(inner)
+            case RUnion():
+                alternatives = operands(expr, RUnion)
+                if any(type(alternative) is REmptyString for alternative in alternatives):
+                    return make_star(make_union([a for a in alternatives if type(a) is not REmptyString]))
+        return intern(RStar(expr))
+
+    def make_plus(expr):
+        match expr:
+            case RNoString() | REmptyString() | RStar() | RPlus():
+                return expr
+            case ROption(expr=inner):
+                return make_star(inner)
+        return intern(RPlus(expr))
+
+    def make_option(expr):
+        match expr:
+            case RNoString() | REmptyString():
+                return intern(REmptyString())
+            case RStar() | ROption():
+                return expr
+            case RPlus(expr=inner):
+                return make_star(inner)
+        return intern(ROption(expr))
+
+    def make_repeat(expr, low, high):
+        match expr:
+            case RNoString() if low > 0:
+                return expr
+            case RNoString() | REmptyString():
+                return intern(REmptyString())
+        match (low, high):
+            case (0, None):
+                return make_star(expr)
+            case (1, None):
+                return make_plus(expr)
+            case (0, 1):
+                return make_option(expr)
+            case (0, 0):
+                return intern(REmptyString())
+            case (1, 1):
+                return expr
+        return intern(RRepeat(expr, low, high))
+
+    # Post-order walk with an explicit stack. Union and concatenation chains are
+    # handled as one n-ary node, so long alternations are not rescanned per level.
+    results = []
+    stack = [(regex, None)]
+    while stack:
+        node, arity = stack.pop()
+        if arity is None:
+            match node:
+                case RUnion() | RConcat():
+                    children = operands(node, type(node))
+                case _:
+                    children = node._children()
+            if children:
+                stack.append((node, len(children)))
+                stack.extend((child, None) for child in reversed(children))
+                continue
+        simplified = results[len(results) - (arity or 0):]
+        del results[len(results) - (arity or 0):]
+
+        match node:
+            case RUnion():
+                results.append(make_union([leaf for part in simplified for leaf in operands(part, RUnion)]))
+            case RConcat():
+                results.append(make_concat([leaf for part in simplified for leaf in operands(part, RConcat)]))
+            case RStar():
+                results.append(make_star(simplified[0]))
+            case RPlus():
+                results.append(make_plus(simplified[0]))
+            case ROption():
+                results.append(make_option(simplified[0]))
+            case RRepeat():
+                results.append(make_repeat(simplified[0], node.min, node.max))
+            case _:
+                results.append(intern(node))
+    return results.pop()
     
 
 """
 Parsing
 """
+@stats.timed("parse_regex")
 def parse_regex(regex_string: str) -> RegExpr:
+    # Operator-precedence parse with an explicit stack of open groups instead of one
+    # recursive call per nesting level, so arbitrarily deep or long patterns parse in
+    # linear time. Each group tracks the union built so far, the concatenation being
+    # built, and the current unary expression that postfix operators still apply to.
+    class Group:
+        def __init__(self):
+            self.union = None
+            self.concat = None
+            self.unary = None
+
+        def flush_unary(self):
+            if self.unary is not None:
+                self.concat = self.unary if self.concat is None else RConcat(self.concat, self.unary)
+                self.unary = None
+
+        def finish(self, token: str | None) -> RegExpr:
+            self.flush_unary()
+            if self.concat is None:
+                raise ValueError(f"Unexpected token: {token}" if token else "Unexpected end of regex")
+            return self.concat if self.union is None else RUnion(self.union, self.concat)
+
     tokens = deque(regex_string)
-    def parse_primary(tokens: deque[str]) -> RegExpr:
+    groups = [Group()]
+    while tokens:
         token = tokens.popleft()
+        group = groups[-1]
 
         match token:
             case '(':
-                expr = parse_union(tokens)
+                group.flush_unary()
+                groups.append(Group())
+
+            case ')':
+                if len(groups) == 1:
+                    raise ValueError(f"Unexpected token: {token}")
+                expr = groups.pop().finish(token)
+                groups[-1].flush_unary()
+                groups[-1].unary = expr
+
+            case '|':
+                group.union = group.finish(token)
+                group.concat = None
+
+            case '*' | '+' | '?':
+                if group.unary is None:
+                    raise ValueError(f"Unexpected token: {token}")
+                match token:
+                    case '*':
+                        group.unary = RStar(group.unary)
+
+                    case '+':
+                        group.unary = RPlus(group.unary)
+
+                    case '?':
+                        group.unary = ROption(group.unary)
+
+            case '{':
+                # counted repetition: {m}, {m,} or {m,n}
+                if group.unary is None:
+                    raise ValueError(f"Unexpected token: {token}")
+                spec = []
+                while tokens and tokens[0] != '}':
+                    spec.append(tokens.popleft())
+                if not tokens:
+                    raise ValueError("Missing closing brace")
                 tokens.popleft()
-                return expr
+                low, comma, high = "".join(spec).partition(",")
+                if not low.isdecimal() or high and not high.isdecimal():
+                    raise ValueError(f"Invalid repetition: {{{''.join(spec)}}}")
+                low = int(low)
+                high = int(high) if high else None if comma else low
+                if high is not None and high < low:
+                    raise ValueError(f"Invalid repetition: {{{''.join(spec)}}}")
+                group.unary = RRepeat(group.unary, low, high)
 
             case '.':
-                return RAny()
+                group.flush_unary()
+                group.unary = RAny()
 
             case _ if token.isalnum():
-                return RSingle(token)
-
-        raise ValueError(f"Unexpected token: {token}")
-
-    def parse_unary(tokens: deque[str]) -> RegExpr:
-        expr = parse_primary(tokens)
-
-        while tokens and tokens[0] in '*+?':
-            token = tokens.popleft()
-
-            match token:
-                case '*':
-                    expr = RStar(expr)
-
-                case '+':
-                    expr = RPlus(expr)
-
-                case '?':
-                    expr = ROption(expr)
-
-        return expr
-
-    def parse_concat(tokens: deque[str]) -> RegExpr:
-        expr = parse_unary(tokens)
-
-        while tokens and (tokens[0].isalnum() or tokens[0] in "(."):
-            next_expr = parse_unary(tokens)
-            if expr is not None:
-                expr = RConcat(expr, next_expr)
-            else:
-                expr = next_expr
-
-        return expr
-
-    def parse_union(tokens: deque[str]) -> RegExpr:
-        expr = parse_concat(tokens)
-
-        while tokens and tokens[0] == '|':
-            tokens.popleft()
-            expr = RUnion(expr, parse_concat(tokens))
+                group.flush_unary()
+                group.unary = RSingle(token)
 
-        return expr
+            case _:
+                raise ValueError(f"Unexpected token: {token}")
 
-    return parse_union(tokens)
\ No newline at end of file
+    if len(groups) != 1:
+        raise ValueError("Missing closing parenthesis")
+    return groups[0].finish(None)
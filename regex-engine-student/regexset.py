@@ -0,0 +1,54 @@
+#regexset.py
+from regex import parse_regex
+from fa import NFAState, NFA, LazyDFA, EPSILON
+
+class RegexSet:
+    """
+    Many patterns compiled into one automaton. The Thompson NFAs of all patterns hang
+    off a shared start state and every accept state is labelled with the index of its
+    pattern, so one pass over the input reports every pattern that matches it.
+    Matching runs on a LazyDFA, so only the DFA states the inputs reach are built.
+    """
+    def __init__(self, patterns, max_states=4096):
+        self.patterns = list(patterns)
+
+        start = NFAState(False, 0)
+        states = {start}
+        accept_labels = {}
+        for pattern_id, pattern in enumerate(self.patterns):
+            nfa = NFA.from_regex(parse_regex(pattern))
+            start.add_transition(EPSILON, nfa.start_state)
+            # every NFA numbers its states from 0, so shift them past the ones taken
+            offset = len(states)
+            for state in nfa.states:
+                state.id += offset
+                if state.is_final:
+                    accept_labels[state.id] = pattern_id
+            states.update(nfa.states)
+
+        self.nfa = NFA(start, states)
+        self.dfa = LazyDFA.from_nfa(self.nfa, max_states)
+
+        # dense NFA state index -> pattern id, for the accepting states only
+        compiled = self.nfa.compile()
+        self._labels = {compiled.index_of(state_id): pattern_id for state_id, pattern_id in accept_labels.items()}
+        # NFA state set -> ids of the patterns it accepts
+        self._matches_of_set = {}
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def _matches(self, state_set):
+        matches = self._matches_of_set.get(state_set)
+        if matches is None:
+            matches = tuple(sorted({self._labels[i] for i in state_set & self.nfa.compile().final_states}))
+            if len(self._matches_of_set) < self.dfa.max_states:
+                self._matches_of_set[state_set] = matches
+        return matches
+
+    def matches(self, input_string):
+        # ids (indices into self.patterns) of every pattern that matches the whole input
+        return list(self._matches(self.dfa.run(input_string)))
+
+    def is_match(self, input_string):
+        return self.nfa.compile().is_final_set(self.dfa.run(input_string))
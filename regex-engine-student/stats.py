@@ -0,0 +1,78 @@
+#stats.py
+import functools
+import time
+from contextlib import contextmanager
+
+class Stats:
+    """
+    Counters filled in by the parser, the automaton builders and the matchers while
+    a collect() block is active. Phases may nest (DFA.from_nfa includes the
+    minimize() it calls), so phase times do not add up to the wall time.
+    If a callback is given it is also called as callback(event, data) for every
+    phase ("phase"), built automaton ("automaton") and lazy DFA eviction or NFA
+    fallback ("eviction", "fallback").
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.states_created = 0
+        self.transitions_created = 0
+        self.closures = 0
+        self.subset_iterations = 0
+        self.peak_active_states = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.phase_seconds = {}
+
+    def event(self, event, **data):
+        if self.callback is not None:
+            self.callback(event, data)
+
+    def add_phase(self, name, seconds):
+        self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + seconds
+        self.event("phase", name=name, seconds=seconds)
+
+    def add_automaton(self, kind, states, transitions):
+        self.states_created += states
+        self.transitions_created += transitions
+        self.event("automaton", kind=kind, states=states, transitions=transitions)
+
+    def add_active(self, count):
+        if count > self.peak_active_states:
+            self.peak_active_states = count
+
+    def as_dict(self):
+        return {name: value for name, value in vars(self).items() if name != "callback"}
+
+    def __repr__(self):
+        return "Stats(" + ", ".join(f"{name}={value!r}" for name, value in self.as_dict().items()) + ")"
+
+# The Stats being collected into, or None. Every hook checks this once per operation
+# (not per input symbol), so disabled instrumentation costs a global lookup.
+active = None
+
+@contextmanager
+def collect(callback=None):
+    # with collect() as s: ... gathers everything run inside the block into s
+    global active
+    previous = active
+    stats = active = Stats(callback)
+    try:
+        yield stats
+    finally:
+        active = previous
+
+def timed(name):
+    # Decorator recording each call's duration as phase `name` of the active Stats
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            stats = active
+            if stats is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stats.add_phase(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
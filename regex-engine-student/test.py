@@ -1,5 +1,19 @@
-from regex import parse_regex, RSingle
-from fa import NFA, DFA, SUPPORTED_SYMBOLS, EPSILON
+import itertools
+import json
+import os
+import random
+import tempfile
+from regex import parse_regex, simplify, RSingle
+from fa import NFA, DFA, LazyDFA, SUPPORTED_SYMBOLS, EPSILON, scan_file
+from regexset import RegexSet
+import engine
+from prefilter import literal_info
+from aho import AhoCorasick, literal_alternatives
+import batch
+import bench
+import stats
+import export
+from batch import match_many, accepts_array
 
 def test_regexpr_str(): 
     assert str(parse_regex("a")) == "RSingle('a')", f"Part 1 Test 1 failed: Expected 'RSingle('a')', got {RSingle('a')}"
@@ -45,4 +59,477 @@ def test_dfa():
     assert dfa2.accepts("ad") == False, f"Part 3 Test 5 failed: Expected False, got {dfa2.accepts('ad')}"
     assert dfa2.accepts("a") == True, f"Part 3 Test 6 failed: Expected True, got {dfa2.accepts('a')}"
     
-    print("Part 3 tests passed!")
\ No newline at end of file
+    print("Part 3 tests passed!")
+
+def test_nfa_simulation():
+    # patterns that used to blow up the BFS queue or loop on epsilon cycles
+    nfa1 = NFA.from_regex(parse_regex("(a|a)*b"))
+    assert nfa1.accepts("a" * 200 + "b") == True, "NFA simulation Test 1 failed: Expected True"
+    assert nfa1.accepts("a" * 200) == False, "NFA simulation Test 2 failed: Expected False"
+
+    nfa2 = NFA.from_regex(parse_regex("(a*)*"))
+    assert nfa2.accepts(EPSILON) == True, f"NFA simulation Test 3 failed: Expected True, got {nfa2.accepts('')}"
+    assert nfa2.accepts("aaaa") == True, f"NFA simulation Test 4 failed: Expected True, got {nfa2.accepts('aaaa')}"
+    assert nfa2.accepts("aab") == False, f"NFA simulation Test 5 failed: Expected False, got {nfa2.accepts('aab')}"
+
+    print("NFA simulation tests passed!")
+
+
+def test_compiled_nfa():
+    nfa = NFA.from_regex(parse_regex("a(b|c)*"))
+    compiled = nfa.compile()
+    assert compiled.num_states == len(nfa.states), f"Compiled NFA Test 1 failed: Expected {len(nfa.states)} states, got {compiled.num_states}"
+    assert compiled.state_ids[0] == nfa.start_state.id, "Compiled NFA Test 2 failed: Expected the start state to be renumbered to 0"
+    for state in nfa.states:
+        assert nfa.is_final_state(state.id) == state.is_final, f"Compiled NFA Test 3 failed: Wrong final flag for state {state.id}"
+
+    dfa = DFA.from_nfa(NFA.from_regex(parse_regex("A(b|1)*")))
+    assert dfa.accepts("Ab1b") == True, f"Compiled NFA Test 4 failed: Expected True, got {dfa.accepts('Ab1b')}"
+    assert dfa.accepts("ab") == False, f"Compiled NFA Test 5 failed: Expected False, got {dfa.accepts('ab')}"
+
+    # ids are dense per automaton, so rebuilding a pattern gives the same automaton
+    again = NFA.from_regex(parse_regex("a(b|c)*"))
+    assert sorted(state.id for state in again.states) == list(range(len(again.states))), "Compiled NFA Test 6 failed: Expected dense ids"
+    assert again.transition_table == nfa.transition_table, "Compiled NFA Test 7 failed: Expected identical transition tables"
+    dfa_again = DFA.from_nfa(NFA.from_regex(parse_regex("A(b|1)*")))
+    assert dfa_again.to_bytes() == dfa.to_bytes(), "Compiled NFA Test 8 failed: Expected identical DFA tables"
+    assert not hasattr(nfa.start_state, "__dict__"), "Compiled NFA Test 9 failed: Expected states without an instance dict"
+
+    print("Compiled NFA tests passed!")
+
+
+def test_lazy_dfa():
+    # the eager DFA for this family has 2^(n+1) states
+    pattern = "(a|b)*a" + "(a|b)" * 12
+    nfa = NFA.from_regex(parse_regex(pattern))
+    lazy = LazyDFA.from_nfa(nfa, max_states=16)
+
+    for text in ["a" * 13, "b" * 13, "ab" * 20, "ba" * 20 + "a", "a" + "b" * 12, "b" * 30 + "a" + "b" * 12]:
+        assert lazy.accepts(text) == nfa.accepts(text), f"Lazy DFA Test 1 failed on {text!r}: Expected {nfa.accepts(text)}"
+    assert lazy.num_cached_states <= 16, f"Lazy DFA Test 2 failed: Expected at most 16 cached states, got {lazy.num_cached_states}"
+
+    rng = random.Random(0)
+    text = "".join(rng.choice("ab") for _ in range(2000))
+    assert lazy.accepts(text) == nfa.accepts(text), "Lazy DFA Test 3 failed: fallback result differs from the NFA"
+    assert lazy.fallbacks > 0, "Lazy DFA Test 4 failed: Expected the thrashing cache to fall back to the NFA"
+
+    lazy2 = LazyDFA.from_nfa(NFA.from_regex(parse_regex("a(b|c)*")))
+    assert lazy2.accepts("acc") == True, f"Lazy DFA Test 5 failed: Expected True, got {lazy2.accepts('acc')}"
+    assert lazy2.accepts("ad") == False, f"Lazy DFA Test 6 failed: Expected False, got {lazy2.accepts('ad')}"
+
+    print("Lazy DFA tests passed!")
+
+
+def test_minimize():
+    # the textbook (a|b)*abb example: subset construction gives 5 states, the minimal DFA has 4
+    dfa = DFA.from_nfa(NFA.from_regex(parse_regex("(a|b)*abb")))
+    minimal = dfa.minimize()
+    assert len(minimal.states) == 4, f"Minimize Test 1 failed: Expected 4 states, got {len(minimal.states)}"
+    assert minimal.state_counts == (len(dfa.states), 4), f"Minimize Test 2 failed: got {minimal.state_counts}"
+    for text in ["abb", "aabb", "babb", "ab", "abba", ""]:
+        assert minimal.accepts(text) == dfa.accepts(text), f"Minimize Test 3 failed on {text!r}"
+
+    minimal2 = DFA.from_nfa(NFA.from_regex(parse_regex("(a*)*|a*")), minimize=True)
+    assert len(minimal2.states) == 1, f"Minimize Test 4 failed: Expected 1 state, got {len(minimal2.states)}"
+    assert minimal2.accepts("aaa") == True, f"Minimize Test 5 failed: Expected True, got {minimal2.accepts('aaa')}"
+
+    print("Minimize tests passed!")
+
+
+def test_dense_dfa():
+    dfa = DFA.from_nfa(NFA.from_regex(parse_regex("a(b|c)*")))
+    assert len(dfa.table) == (dfa.num_states + 1) * dfa.width, f"Dense DFA Test 1 failed: got a table of {len(dfa.table)} entries"
+    for text, expected in [("acc", True), ("ad", False), ("a", True), ("", False), ("ab\u00e9", False)]:
+        assert dfa.accepts(text) == expected, f"Dense DFA Test 2 failed on {text!r}: Expected {expected}"
+        data = text.encode("utf-8")
+        for view in (data, bytearray(data), memoryview(data)):
+            assert dfa.accepts(view) == expected, f"Dense DFA Test 3 failed on {view!r}: Expected {expected}"
+
+    print("Dense DFA tests passed!")
+
+
+def test_symbol_classes():
+    dfa = DFA.from_nfa(NFA.from_regex(parse_regex("(a|b|c)*d")), minimize=True)
+    assert dfa.num_classes == 2, f"Symbol classes Test 1 failed: Expected 2 classes, got {dfa.class_symbols}"
+    assert dfa.symbol_codes["a"] == dfa.symbol_codes["c"] != dfa.symbol_codes["d"], "Symbol classes Test 2 failed: Expected a and c to share a class"
+    assert dfa.accepts("abcabd") == True, f"Symbol classes Test 3 failed: Expected True, got {dfa.accepts('abcabd')}"
+    assert dfa.accepts("abce") == False, f"Symbol classes Test 4 failed: Expected False, got {dfa.accepts('abce')}"
+
+    print("Symbol classes tests passed!")
+
+
+def test_large_patterns():
+    # thousands of alternatives and deep nesting used to hit RecursionError
+    words = ["".join(letters) for letters in itertools.islice(itertools.product("abcdefgh", repeat=4), 3000)]
+    nfa = NFA.from_regex(parse_regex("|".join(words)))
+    assert nfa.accepts(words[-1]) == True, f"Large pattern Test 1 failed: Expected True, got {nfa.accepts(words[-1])}"
+    assert nfa.accepts("abcz") == False, f"Large pattern Test 2 failed: Expected False, got {nfa.accepts('abcz')}"
+
+    nested = parse_regex("(" * 3000 + "a" + ")*" * 3000)
+    nfa2 = NFA.from_regex(nested)
+    assert nfa2.accepts("aaa") == True, f"Large pattern Test 3 failed: Expected True, got {nfa2.accepts('aaa')}"
+    assert nfa2.accepts("ab") == False, f"Large pattern Test 4 failed: Expected False, got {nfa2.accepts('ab')}"
+
+    print("Large pattern tests passed!")
+
+
+def test_regex_set():
+    patterns = ["a*", "ab(c|d)*", "(a|b)*b", "abc"]
+    regex_set = RegexSet(patterns)
+    for text in ["", "a", "abc", "abdd", "bb", "abcb", "x"]:
+        expected = [i for i, pattern in enumerate(patterns) if NFA.from_regex(parse_regex(pattern)).accepts(text)]
+        assert regex_set.matches(text) == expected, f"Regex set Test 1 failed on {text!r}: Expected {expected}, got {regex_set.matches(text)}"
+        assert regex_set.is_match(text) == bool(expected), f"Regex set Test 2 failed on {text!r}: Expected {bool(expected)}"
+
+    print("Regex set tests passed!")
+
+
+def test_compile_cache():
+    engine.purge()
+    dfa = engine.compile("a(b|c)*")
+    assert engine.compile("a(b|c)*") is dfa, "Compile cache Test 1 failed: Expected the cached DFA"
+    assert dfa.accepts("abc") == True, f"Compile cache Test 2 failed: Expected True, got {dfa.accepts('abc')}"
+    info = engine.cache_info()
+    # the first call misses on both the DFA and the NFA it is built from
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 2), f"Compile cache Test 3 failed: got {info}"
+
+    # a small limit keeps the eviction check fast
+    max_cache_size = engine.MAX_CACHE_SIZE
+    engine.MAX_CACHE_SIZE = 4
+    try:
+        for i in range(engine.MAX_CACHE_SIZE + 5):
+            engine.compile("a" * (i + 1), mode="nfa")
+        info = engine.cache_info()
+        assert info.currsize == engine.MAX_CACHE_SIZE, f"Compile cache Test 4 failed: got {info}"
+        assert info.evictions == 7, f"Compile cache Test 5 failed: Expected 7 evictions, got {info}"
+    finally:
+        engine.MAX_CACHE_SIZE = max_cache_size
+        engine.purge()
+
+    print("Compile cache tests passed!")
+
+
+def test_dfa_file():
+    pattern = "a(b|c)*d"
+    dfa = DFA.from_nfa(NFA.from_regex(parse_regex(pattern)), minimize=True)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "pattern.dfa")
+        dfa.save(path, pattern)
+        loaded = DFA.load(path, pattern)
+        assert loaded.states is None, "DFA file Test 1 failed: Expected a table-only DFA"
+        for text in ["ad", "abcbd", "abc", "", "x", b"abd"]:
+            assert loaded.accepts(text) == dfa.accepts(text), f"DFA file Test 2 failed on {text!r}: Expected {dfa.accepts(text)}"
+
+        try:
+            DFA.load(path, "a*")
+            assert False, "DFA file Test 3 failed: Expected a stale file to be rejected"
+        except ValueError:
+            pass
+        data = open(path, "rb").read()
+        for broken in (data[:-3], data[:20], b"garbage"):
+            try:
+                DFA.from_bytes(broken)
+                assert False, f"DFA file Test 4 failed: Expected a {len(broken)}-byte buffer to be rejected"
+            except ValueError:
+                pass
+        last_entry = len(data) - (dfa.num_states + 1) - 4
+        for entry in (1, (dfa.num_states + 1) * dfa.width, -dfa.width):
+            broken = data[:last_entry] + entry.to_bytes(4, "little", signed=True) + data[last_entry + 4:]
+            try:
+                DFA.from_bytes(broken)
+                assert False, f"DFA file Test 5 failed: Expected a table entry of {entry} to be rejected"
+            except ValueError:
+                pass
+        del loaded
+
+    print("DFA file tests passed!")
+
+
+def test_search():
+    nfa = NFA.from_regex(parse_regex("ab(c|d)*"))
+    dfa = DFA.from_nfa(nfa)
+    text = "xxabcdcxabyabd"
+    expected = [(2, 7), (8, 10), (11, 14)]
+    for automaton in (nfa, dfa):
+        assert automaton.search(text) == (2, 7), f"Search Test 1 failed: Expected (2, 7), got {automaton.search(text)}"
+        assert automaton.search(text, 3) == (8, 10), f"Search Test 2 failed: Expected (8, 10), got {automaton.search(text, 3)}"
+        assert list(automaton.finditer(text)) == expected, f"Search Test 3 failed: Expected {expected}, got {list(automaton.finditer(text))}"
+        assert automaton.search("xyz") is None, "Search Test 4 failed: Expected no match"
+        assert automaton.search(text, len(text) + 1) is None, "Search Test 4 failed: Expected no match past the end"
+        assert NFA.from_regex(parse_regex("a*")).search("aa", 3) is None, "Search Test 4 failed: Expected no empty match past the end"
+    assert list(dfa.finditer(text.encode())) == expected, "Search Test 5 failed on bytes input"
+    for view in (text.encode(), bytearray(text.encode()), memoryview(text.encode())):
+        assert dfa.search(view, 3) == (8, 10), f"Search Test 5 failed on {type(view).__name__} input from a position"
+
+    # leftmost wins over the match that ends first, and empty matches advance the scan
+    nfa2 = NFA.from_regex(parse_regex("abcd|c"))
+    assert nfa2.search("abcd") == (0, 4), f"Search Test 6 failed: Expected (0, 4), got {nfa2.search('abcd')}"
+    nfa3 = NFA.from_regex(parse_regex("a*"))
+    assert list(nfa3.finditer("aab")) == [(0, 2), (2, 2), (3, 3)], f"Search Test 7 failed: got {list(nfa3.finditer('aab'))}"
+
+    print("Search tests passed!")
+
+
+def test_stream():
+    dfa = DFA.from_nfa(NFA.from_regex(parse_regex("ab(c|d)*")))
+    text = "xxabcdcxabyabd"
+    matcher = dfa.stream()
+    spans = []
+    for i in range(0, len(text), 3):
+        spans += matcher.feed(text[i:i + 3])
+    spans += matcher.finish()
+    assert spans == list(dfa.finditer(text)), f"Stream Test 1 failed: Expected {list(dfa.finditer(text))}, got {spans}"
+
+    extending = DFA.from_nfa(NFA.from_regex(parse_regex("a|ab*c"))).stream(max_pending=100)
+    assert extending.feed("a" + "b" * 100) == [], "Stream Test 5 failed: Expected no finished match yet"
+    try:
+        extending.feed("b")
+        assert False, "Stream Test 5 failed: Expected the held symbols to exceed max_pending"
+    except ValueError:
+        pass
+
+    anchored = dfa.stream(anchored=True)
+    anchored.feed("abc")
+    anchored.feed(b"dcd")
+    assert anchored.finish() == [(0, 6)], f"Stream Test 2 failed: Expected [(0, 6)], got {anchored.finish()}"
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "input.log")
+        with open(path, "w") as f:
+            f.write("xxabcab" * 500)
+        expected = list(dfa.finditer("xxabcab" * 500))
+        for use_mmap in (False, True):
+            spans = list(scan_file(dfa, path, chunk_size=64, use_mmap=use_mmap))
+            assert spans == expected, f"Stream Test 3 failed with use_mmap={use_mmap}"
+        # a match that may be extended across many chunks is rescanned from the file
+        extending = DFA.from_nfa(NFA.from_regex(parse_regex("e(.*q)?|b")))
+        with open(path, "w") as f:
+            f.write("e" + "abc" * 300)
+        expected = list(extending.finditer("e" + "abc" * 300))
+        for use_mmap in (False, True):
+            spans = list(scan_file(extending, path, chunk_size=16, use_mmap=use_mmap))
+            assert spans == expected, f"Stream Test 6 failed with use_mmap={use_mmap}: Expected {expected}, got {spans}"
+        early = scan_file(dfa, path, chunk_size=64, use_mmap=True)
+        next(early)
+        early.close()
+        empty = os.path.join(directory, "empty.log")
+        open(empty, "w").close()
+        for use_mmap in (False, True):
+            spans = list(scan_file(dfa, empty, use_mmap=use_mmap))
+            assert spans == [], f"Stream Test 4 failed with use_mmap={use_mmap}: Expected no matches, got {spans}"
+
+    print("Stream tests passed!")
+
+
+def test_prefilter():
+    cases = [("error(a|b)*", "error", "error"), ("(a|b)*timeout(a|b)*", "", "timeout"),
+             ("abc|abd", "ab", "ab"), ("x(abc|zabcq)y", "x", "abc"), ("a*", "", "")]
+    for pattern, prefix, required in cases:
+        info = literal_info(parse_regex(pattern))
+        assert (info.prefix, info.required) == (prefix, required), \
+            f"Prefilter Test 1 failed on {pattern}: Expected {(prefix, required)}, got {(info.prefix, info.required)}"
+
+    nfa = NFA.from_regex(parse_regex("error(a|b)*"))
+    dfa = DFA.from_nfa(nfa)
+    assert nfa.prefilter.rejects("erroab") == True, "Prefilter Test 2 failed: Expected the input to be rejected"
+    assert nfa.prefilter.required == "", "Prefilter Test 2 failed: A required literal inside the prefix should not be checked again"
+    text = "x" * 1000 + "errorabab" + "y" * 10
+    for automaton in (nfa, dfa):
+        assert automaton.search(text) == (1000, 1009), f"Prefilter Test 3 failed: got {automaton.search(text)}"
+        assert automaton.accepts("errorab") == True, "Prefilter Test 4 failed: Expected True"
+        assert automaton.search("x" * 1000) is None, "Prefilter Test 5 failed: Expected no match"
+    assert dfa.search(text.encode()) == (1000, 1009), "Prefilter Test 6 failed on bytes input"
+    wildcard = DFA.from_nfa(NFA.from_regex(parse_regex(".*timeout.*")))
+    for line, expected in (("x" * 5000, False), ("x" * 5000 + "timeout", True), ("timeout", True)):
+        assert wildcard.accepts(line) == expected, f"Prefilter Test 7 failed on a {len(line)}-symbol line: Expected {expected}"
+    view = memoryview(text.encode() * 3)
+    assert list(dfa.finditer(view)) == list(dfa.finditer(text * 3)), "Prefilter Test 8 failed on memoryview input"
+
+    print("Prefilter tests passed!")
+
+
+def test_aho_corasick():
+    assert literal_alternatives(parse_regex("he|she|(his|hers)")) == ["he", "she", "his", "hers"], "Aho-Corasick Test 1 failed"
+    assert literal_alternatives(parse_regex("he|s*")) is None, "Aho-Corasick Test 2 failed: Expected None for a non-literal pattern"
+
+    pattern = "he|she|his|hers"
+    automaton = AhoCorasick.from_regex(parse_regex(pattern))
+    nfa = NFA.from_regex(parse_regex(pattern))
+    for text in ["ushers", "she", "hishe", "h", ""]:
+        assert automaton.accepts(text) == nfa.accepts(text), f"Aho-Corasick Test 3 failed on {text!r}"
+        assert list(automaton.finditer(text)) == list(nfa.finditer(text)), f"Aho-Corasick Test 4 failed on {text!r}"
+    assert automaton.search(b"ushers") == (1, 4), f"Aho-Corasick Test 5 failed: got {automaton.search(b'ushers')}"
+
+    engine.purge()
+    assert isinstance(engine.compile(pattern, mode="auto"), AhoCorasick), "Aho-Corasick Test 6 failed: Expected auto mode to pick Aho-Corasick"
+    assert isinstance(engine.compile(pattern), DFA), "Aho-Corasick Test 7 failed: Expected a DFA by default"
+    assert engine.compile("(he|she)*", mode="auto") is engine.compile("(he|she)*"), "Aho-Corasick Test 8 failed: Expected auto mode to share the cached DFA"
+    engine.purge()
+
+    print("Aho-Corasick tests passed!")
+
+
+def test_simplify():
+    cases = [("(a*)*", "RStar(RSingle('a'))"), ("a|a", "RSingle('a')"), ("(a|b)|(b|a)", "RClass('ab')"),
+             ("(a+)?", "RStar(RSingle('a'))"), ("((a|b)c)|((b|a)c)", "RConcat(RClass('ab'),RSingle('c'))")]
+    for pattern, expected in cases:
+        assert str(simplify(parse_regex(pattern))) == expected, \
+            f"Simplify Test 1 failed on {pattern}: Expected {expected}, got {simplify(parse_regex(pattern))}"
+
+    assert parse_regex("a(b|c)*") == parse_regex("a(b|c)*"), "Simplify Test 2 failed: Expected structural equality"
+    assert parse_regex("a(b|c)*") != parse_regex("a(c|b)*"), "Simplify Test 3 failed: Expected different trees"
+    assert len({parse_regex("ab"), parse_regex("ab"), parse_regex("ba")}) == 2, "Simplify Test 4 failed: Expected structural hashing"
+    tree = simplify(parse_regex("(ab|c)(ab|c)"))
+    assert tree.left is tree.right, "Simplify Test 5 failed: Expected equal subtrees to be shared"
+
+    nfa = NFA.from_regex(parse_regex("((a|b)|(b|a))*"))
+    assert len(nfa.states) == 4, f"Simplify Test 6 failed: Expected 4 states, got {len(nfa.states)}"
+    assert nfa.accepts("abba") == True, f"Simplify Test 7 failed: Expected True, got {nfa.accepts('abba')}"
+
+    print("Simplify tests passed!")
+
+
+def test_match_many():
+    pattern = "ab(c|d)*"
+    dfa = DFA.from_nfa(NFA.from_regex(parse_regex(pattern)))
+    rng = random.Random(1)
+    items = ["ab" + "".join(rng.choice("cdx") for _ in range(rng.randint(0, 4))) for _ in range(500)]
+    expected = [dfa.accepts(item) for item in items]
+    assert list(match_many(pattern, items, workers=1)) == expected, "Match many Test 1 failed in-process"
+    assert list(match_many(dfa, iter(items), workers=2, chunksize=64)) == expected, "Match many Test 2 failed with worker processes"
+
+    if batch.np is not None:
+        items += ["", "abé", "ab€c"]
+        expected = [dfa.accepts(item) for item in items]
+        assert accepts_array(dfa, items).tolist() == expected, "Match many Test 3 failed with NumPy on str input"
+        encoded = [item.encode("utf-8") for item in items]
+        assert accepts_array(dfa, encoded).tolist() == [dfa.accepts(item) for item in encoded], "Match many Test 4 failed with NumPy on bytes input"
+        assert accepts_array(dfa, []).tolist() == [], "Match many Test 5 failed with an empty batch"
+
+    print("Match many tests passed!")
+
+
+def test_bench():
+    results = bench.run([bench.blowup(3, 200), bench.literal_alternation(10, inputs=20)], min_seconds=0)
+    blowup, literals = results["workloads"]
+    assert blowup["dfa_states"] == 2 ** 4 + 1, f"Bench Test 1 failed: Expected 17 DFA states, got {blowup['dfa_states']}"
+    assert set(blowup["phases"]) == {"parse_regex", "nfa_from_regex", "dfa_from_nfa"}, "Bench Test 2 failed: Missing phases"
+    assert all(phase["peak_bytes"] > 0 for phase in literals["phases"].values()), "Bench Test 3 failed: Expected peak memory per phase"
+    assert set(literals["accepts"]) == {"nfa", "dfa", "lazy"}, "Bench Test 4 failed: Expected one entry per engine"
+    assert json.loads(json.dumps(results)) == results, "Bench Test 5 failed: Results are not JSON serializable"
+    try:
+        bench.main(["--quick", "--jsn", "-"])
+        assert False, "Bench Test 6 failed: Expected an unknown option to be rejected"
+    except ValueError:
+        pass
+
+    print("Bench tests passed!")
+
+
+def test_stats():
+    events = []
+    with stats.collect(lambda event, data: events.append((event, data))) as collected:
+        nfa = NFA.from_regex(parse_regex("(a|b)*abb"))
+        dfa = DFA.from_nfa(nfa)
+        nfa.accepts("aabb")
+        lazy = LazyDFA.from_nfa(nfa)
+        lazy.accepts("aabb")
+        lazy.accepts("aabb")
+    assert stats.active is None, "Stats Test 1 failed: Collection should stop after the block"
+    assert collected.states_created == len(nfa.states) + len(dfa.states), \
+        f"Stats Test 2 failed: Expected {len(nfa.states) + len(dfa.states)} states created, got {collected.states_created}"
+    assert collected.subset_iterations == len(dfa.states), "Stats Test 3 failed: Expected one subset iteration per DFA state"
+    assert collected.closures > 0 and collected.peak_active_states > 0, "Stats Test 4 failed: Expected closure and simulation counts"
+    assert (collected.cache_hits, collected.cache_misses) == (4, 4), \
+        f"Stats Test 5 failed: Expected 4 lazy DFA hits and 4 misses, got {collected.cache_hits} and {collected.cache_misses}"
+    assert {"parse_regex", "nfa_from_regex", "dfa_from_nfa"} <= set(collected.phase_seconds), "Stats Test 6 failed: Missing phases"
+    assert [data["kind"] for event, data in events if event == "automaton"] == ["nfa", "dfa"], "Stats Test 7 failed: Expected automaton events"
+
+    with stats.collect() as unused:
+        pass
+    DFA.from_nfa(nfa)
+    assert unused.states_created == 0, "Stats Test 8 failed: Nothing should be recorded outside the block"
+
+    print("Stats tests passed!")
+
+
+def test_repetition():
+    cases = [
+        ("ab+c", ["abc", "abbbc"], ["ac", "abcc"]),
+        ("ab?c", ["ac", "abc"], ["abbc"]),
+        ("a.c", ["abc", "a1c", "a-c", "a\u00e9c"], ["ac", "abbc"]),
+        ("a{3}", ["aaa"], ["aa", "aaaa"]),
+        ("(ab){2,}", ["abab", "ababab"], ["ab", "aba"]),
+        ("(a|b){1,3}c", ["ac", "abac"], ["c", "ababc"]),
+        ("x{0,2}", ["", "xx"], ["xxx"]),
+    ]
+    for pattern, accepted, rejected in cases:
+        nfa = NFA.from_regex(parse_regex(pattern))
+        for automaton in (nfa, DFA.from_nfa(nfa), DFA.from_nfa(nfa, minimize=True), LazyDFA.from_nfa(nfa)):
+            for text in accepted:
+                assert automaton.accepts(text), f"Repetition Test 1 failed: {pattern!r} should accept {text!r}"
+            for text in rejected:
+                assert not automaton.accepts(text), f"Repetition Test 2 failed: {pattern!r} should reject {text!r}"
+
+    # direct fragments: a+ needs no copy of a, and . is one wildcard edge
+    assert len(NFA.from_regex(parse_regex("a+")).states) == 3, "Repetition Test 3 failed: Expected 3 states for a+"
+    assert len(NFA.from_regex(parse_regex(".")).states) == 2, "Repetition Test 4 failed: Expected 2 states for ."
+    # nested optional copies keep the DFA linear in the count
+    dfa = DFA.from_nfa(NFA.from_regex(parse_regex("(ab|a){0,40}")))
+    assert len(dfa.states) <= 2 * 40 + 1, f"Repetition Test 5 failed: Expected at most 81 DFA states, got {len(dfa.states)}"
+    for pattern in ["a{", "a{3,2}", "{2}", "a{x}"]:
+        try:
+            parse_regex(pattern)
+            assert False, f"Repetition Test 6 failed: Expected a ValueError for {pattern!r}"
+        except ValueError:
+            pass
+
+    print("Repetition tests passed!")
+
+
+def test_export():
+    assert export.symbol_ranges("cbaxz") == [("a", "c"), ("x", "x"), ("z", "z")], "Export Test 1 failed: Wrong symbol ranges"
+
+    dfa = DFA.from_nfa(NFA.from_regex(parse_regex("(a|b|c|d)x.")))
+    dot = export.write_dot(dfa)
+    assert dot.startswith("digraph DFA {") and '0 -> 1 [label="a-d"];' in dot, f"Export Test 2 failed: Got {dot}"
+    assert '[label="."]' in dot and "shape=doublecircle" in dot, f"Export Test 3 failed: Got {dot}"
+
+    graph = json.loads(export.write_json(dfa))
+    assert [state["id"] for state in graph["states"]] == [0, 1, 2, 3], f"Export Test 4 failed: Got {graph}"
+    assert graph["states"][0]["edges"] == [{"to": 1, "label": "a-d", "ranges": [["a", "d"]], "epsilon": False, "other": False}], \
+        f"Export Test 5 failed: Got {graph['states'][0]}"
+
+    # a subgraph: only states within one edge of state 1, the ones at the edge cut off
+    part = json.loads(export.write_json(dfa, start=1, max_depth=1))
+    assert [(state["id"], state["truncated"]) for state in part["states"]] == [(1, False), (2, True)], f"Export Test 6 failed: Got {part}"
+
+    nfa_graph = json.loads(export.write_json(NFA.from_regex(parse_regex("ab*"))))
+    assert any(edge["epsilon"] for state in nfa_graph["states"] for edge in state["edges"]), "Export Test 7 failed: Expected epsilon edges"
+    loaded = DFA.from_bytes(dfa.to_bytes())
+    assert export.write_dot(loaded) == dot, "Export Test 8 failed: Table-only DFAs should export the same graph"
+
+    print("Export tests passed!")
+
+
+def run_engine_tests():
+    test_nfa_simulation()
+    test_compiled_nfa()
+    test_lazy_dfa()
+    test_minimize()
+    test_dense_dfa()
+    test_symbol_classes()
+    test_large_patterns()
+    test_regex_set()
+    test_compile_cache()
+    test_dfa_file()
+    test_search()
+    test_stream()
+    test_prefilter()
+    test_aho_corasick()
+    test_simplify()
+    test_match_many()
+    test_bench()
+    test_stats()
+    test_repetition()
+    test_export()
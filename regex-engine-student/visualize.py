@@ -1,13 +1,13 @@
 from fa import NFA, DFA, SUPPORTED_SYMBOLS
 try:
     from automathon import NFA as VisualNFA
-    __has_automathon = True
+    has_automathon = True
 except ImportError:
-    print("""The 'automathon' dependency is not installed.
-        Please install it to use visualization
-    """)
     has_automathon = False
 
+# Renders small automata interactively through automathon, which lays out the whole
+# graph at once. For large automata, or without automathon, use export.py (DOT/JSON).
+
 def convert_transitions(fa):
     transitions = {}
     
@@ -28,9 +28,11 @@ def convert_transitions(fa):
 
 
 def convert_to_visual_fa(fa):    
+    if not has_automathon:
+        raise ImportError("The 'automathon' dependency is not installed; use export.py for DOT or JSON output")
     states = {f"q{state.id}" for state in fa.states}
     input_symbols = SUPPORTED_SYMBOLS
     transitions = convert_transitions(fa)
     initial_state = f"q{fa.start_state.id}"
     final_states = {f"q{state.id}" for state in fa.states if state.is_final}
-    return VisualNFA(states, input_symbols, transitions, initial_state, final_states)
\ No newline at end of file
+    return VisualNFA(states, input_symbols, transitions, initial_state, final_states)